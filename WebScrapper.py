@@ -1,31 +1,253 @@
-import requests
 import sqlite3
 import json
 import csv
 import logging
 import argparse
-from bs4 import BeautifulSoup
-from tabulate import tabulate
+import re
+import time
+import random
+import threading
+import os
+import queue
+import itertools
+import hashlib
+import heapq
+import sys
+import importlib.util
+from collections import deque, Counter
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from urllib.parse import urlsplit, urljoin
+from datetime import datetime, timezone
+
+# Heavy and optional dependencies (requests, bs4, tabulate, lxml, selectolax, pyarrow)
+# are imported where they are first used, so --help and quick queries start fast
+HAVE_LXML = importlib.util.find_spec("lxml") is not None
+HAVE_SELECTOLAX = importlib.util.find_spec("selectolax") is not None
+HAVE_PYARROW = importlib.util.find_spec("pyarrow") is not None
+etree = lxml_html = None
+HTMLParser = None
+pa = pq = None
 
 # Configuration
 DATABASE = "books.sqlite3"
 JSON_FILE = "books.json"
 CSV_FILE = "books.csv"
+JSONL_FILE = "books.jsonl"
+ARROW_FILE = "books.arrow"
+PARQUET_FILE = "books.parquet"
+EXPORT_FORMATS = ["json", "csv", "arrow", "parquet"]
+FIELDS = ["title", "currency", "price"]
+DETAIL_FIELDS = FIELDS + ["upc", "stock", "category", "rating", "description", "url"]
+RATINGS = {"One": 1, "Two": 2, "Three": 3, "Four": 4, "Five": 5}
 URL = "http://books.toscrape.com/"
-
-# Logging setup
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler("books_scraper.log"),
-        logging.StreamHandler()
-    ]
-)
+PAGE_PATH = "catalogue/page-{page}.html"
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+SCHEMA_VERSION = 9
+ORDER_KEYS = ["id", "title", "price"]
+BULK_IMPORT_BYTES = 8 * 1024 * 1024
+MAX_JSON_RECORD = 1024 * 1024
+JSON_SEPARATOR_RE = re.compile(r"[ \t\r\n]*(\S)")
+METRICS_PREFIX = "books_scraper"
+LEASE_TIMEOUT = 60.0
+MAX_LEASE_ATTEMPTS = 3
+MAX_FAILED_PAGES = 10
+
+# Run histograms: help text and Prometheus bucket bounds
+HISTOGRAMS = {
+    "fetch_seconds": ("HTTP request latency in seconds", [0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10]),
+    "fetch_bytes": ("Response body size in bytes", [1024, 4096, 16384, 65536, 262144, 1048576]),
+    "parse_seconds": ("Parse time per page in seconds", [0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1]),
+    "write_seconds": ("Database write time per batch in seconds", [0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5]),
+    "write_records_per_second": ("Records per second per database batch", [100, 1000, 10000, 100000, 1000000]),
+}
+
+# Insert a book, or update its price if the title is already stored
+UPSERT_BOOK = """
+    INSERT INTO books (source, title, currency, price) VALUES (?, ?, ?, ?)
+    ON CONFLICT(source, title) DO UPDATE SET currency = excluded.currency, price = excluded.price
+    WHERE books.currency != excluded.currency OR books.price != excluded.price
+"""
+
+# Insert or update a book with its detail-page fields
+UPSERT_BOOK_DETAIL = """
+    INSERT INTO books (source, title, currency, price, upc, stock, category, rating, description, url)
+    VALUES (:source, :title, :currency, :price, :upc, :stock, :category, :rating, :description, :url)
+    ON CONFLICT(source, title) DO UPDATE SET
+        currency = excluded.currency, price = excluded.price, upc = excluded.upc,
+        stock = excluded.stock, category = excluded.category, rating = excluded.rating,
+        description = excluded.description, url = excluded.url
+"""
+
+# Remember the content hash and books of a processed page
+UPSERT_PAGE_HASH = """
+    INSERT INTO page_hashes (url, hash, books, updated_at) VALUES (?, ?, ?, CURRENT_TIMESTAMP)
+    ON CONFLICT(url) DO UPDATE SET hash = excluded.hash, books = excluded.books, updated_at = excluded.updated_at
+"""
+
+# Append a price_history row for a book whose price differs from its latest recorded one
+RECORD_PRICE = """
+    INSERT INTO price_history (book_id, currency, price, run_id, scraped_at)
+    SELECT b.id, b.currency, b.price, ?, CURRENT_TIMESTAMP FROM books b
+    WHERE b.source = ? AND b.title = ? AND (b.currency, b.price) IS NOT (
+        SELECT h.currency, h.price FROM price_history h WHERE h.book_id = b.id ORDER BY h.id DESC LIMIT 1
+    )
+"""
+
+# Same, for every book in one pass (after imports and migration)
+RECORD_ALL_PRICES = """
+    INSERT INTO price_history (book_id, currency, price, run_id, scraped_at)
+    SELECT b.id, b.currency, b.price, ?, CURRENT_TIMESTAMP FROM books b
+    WHERE (b.currency, b.price) IS NOT (
+        SELECT h.currency, h.price FROM price_history h WHERE h.book_id = b.id ORDER BY h.id DESC LIMIT 1
+    )
+"""
+
+# Give up on shards whose lease expired too many times (they keep crashing workers)
+FAIL_EXPIRED_SHARDS = """
+    UPDATE work_queue SET status = 'failed', updated_at = CURRENT_TIMESTAMP
+    WHERE status = 'leased' AND lease_expires < ? AND attempts >= ?
+"""
+
+# Lease the next shard: pending, or leased by a worker whose lease has expired
+LEASE_SHARD = """
+    UPDATE work_queue SET status = 'leased', worker = ?, lease_expires = ?, attempts = attempts + 1,
+        updated_at = CURRENT_TIMESTAMP
+    WHERE id = (
+        SELECT id FROM work_queue
+        WHERE status = 'pending' OR (status = 'leased' AND lease_expires < ?)
+        ORDER BY id LIMIT 1
+    )
+    RETURNING id, base_url, first_page, last_page, attempts
+"""
+
+# Merge a worker's staging table into books
+MERGE_STAGING = """
+    INSERT INTO books (source, title, currency, price)
+    SELECT source, title, currency, price FROM {table} WHERE true
+    ON CONFLICT(source, title) DO UPDATE SET currency = excluded.currency, price = excluded.price
+    WHERE books.currency != excluded.currency OR books.price != excluded.price
+"""
+
+# Logging setup (called from main, so importing the module opens no log file)
+def setup_logging(verbose=False):
+    logging.basicConfig(
+        level=logging.DEBUG if verbose else logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s',
+        handlers=[
+            logging.FileHandler("books_scraper.log"),
+            logging.StreamHandler()
+        ]
+    )
+
+# Histograms and counters for one run, shared by every stage
+class Metrics:
+    def __init__(self):
+        self.values = {name: [] for name in HISTOGRAMS}
+        self.counters = Counter()
+        self.started = time.perf_counter()
+        self.lock = threading.Lock()
+
+    def observe(self, name, value):
+        with self.lock:
+            self.values[name].append(value)
+
+    def count(self, name, amount=1):
+        with self.lock:
+            self.counters[name] += amount
+
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    # count/sum/mean/p50/p90/p99/max per histogram
+    def summary(self):
+        summary = {}
+        with self.lock:
+            values = {name: sorted(observed) for name, observed in self.values.items()}
+        for name, observed in values.items():
+            if not observed:
+                continue
+            summary[name] = {
+                "count": len(observed),
+                "sum": sum(observed),
+                "mean": sum(observed) / len(observed),
+                "p50": observed[len(observed) // 2],
+                "p90": observed[min(len(observed) - 1, int(len(observed) * 0.90))],
+                "p99": observed[min(len(observed) - 1, int(len(observed) * 0.99))],
+                "max": observed[-1],
+            }
+        return summary
+
+    def log_summary(self):
+        summary = self.summary()
+        elapsed = self.elapsed()
+        rows = [[name] + list(stat.values()) for name, stat in summary.items()]
+        if rows:
+            from tabulate import tabulate
+            print(tabulate(rows, headers=["metric", "count", "sum", "mean", "p50", "p90", "p99", "max"], floatfmt=".4g"))
+        records = self.counters["records"]
+        logging.info(f"Run: {records} records in {elapsed:.2f}s ({records / elapsed if elapsed else 0:.0f} records/sec)")
+
+    def to_json(self):
+        elapsed = self.elapsed()
+        return {
+            "elapsed_seconds": elapsed,
+            "records_per_second": self.counters["records"] / elapsed if elapsed else 0.0,
+            "counters": dict(self.counters),
+            "histograms": self.summary(),
+        }
+
+    # Prometheus text exposition format (for the node_exporter textfile collector)
+    def to_prometheus(self):
+        lines = []
+        with self.lock:
+            values = {name: list(observed) for name, observed in self.values.items()}
+            counters = dict(self.counters)
+        for name, (help_text, buckets) in HISTOGRAMS.items():
+            metric = f"{METRICS_PREFIX}_{name}"
+            observed = values[name]
+            lines.append(f"# HELP {metric} {help_text}")
+            lines.append(f"# TYPE {metric} histogram")
+            for bound in buckets:
+                lines.append(f'{metric}_bucket{{le="{bound}"}} {sum(1 for value in observed if value <= bound)}')
+            lines.append(f'{metric}_bucket{{le="+Inf"}} {len(observed)}')
+            lines.append(f"{metric}_sum {sum(observed)}")
+            lines.append(f"{metric}_count {len(observed)}")
+        for name, value in sorted(counters.items()):
+            lines.append(f"# TYPE {METRICS_PREFIX}_{name}_total counter")
+            lines.append(f"{METRICS_PREFIX}_{name}_total {value}")
+        lines.append(f"# TYPE {METRICS_PREFIX}_run_seconds gauge")
+        lines.append(f"{METRICS_PREFIX}_run_seconds {self.elapsed()}")
+        return "\n".join(lines) + "\n"
+
+    # Write the metrics atomically, so collectors never read a partial file
+    def write(self, path, fmt="json"):
+        temp = f"{path}.tmp"
+        try:
+            with open(temp, "w", encoding="utf-8") as f:
+                if fmt == "prometheus":
+                    f.write(self.to_prometheus())
+                else:
+                    json.dump(self.to_json(), f, indent=2)
+            os.replace(temp, path)
+        except OSError as e:
+            logging.error(f"Metrics error: {e}")
+            return
+        logging.info(f"Metrics saved to {path}")
+
+metrics = Metrics()
+
+# Start a fresh set of run metrics
+def reset_metrics():
+    global metrics
+    metrics = Metrics()
+    return metrics
 
 # Create table
 def create_table():
     with sqlite3.connect(DATABASE) as con:
+        if con.execute("PRAGMA user_version").fetchone()[0] == SCHEMA_VERSION:
+            logging.debug("Database schema is up to date.")
+            return
         cur = con.cursor()
         cur.execute("""
             CREATE TABLE IF NOT EXISTS books(
@@ -35,634 +257,2400 @@ def create_table():
                 price REAL NOT NULL
             );
         """)
+        migrate(con)
     logging.info("Database table ready.")
 
-# Insert book with duplicate check
-def insert_book(title, currency, price):
+# Bring an existing database up to SCHEMA_VERSION
+def migrate(con):
+    version = con.execute("PRAGMA user_version").fetchone()[0]
+    if version < 1:
+        # One-time dedup: keep the most recently inserted row per title
+        removed = con.execute("""
+            DELETE FROM books
+            WHERE id NOT IN (SELECT MAX(id) FROM books GROUP BY title)
+        """).rowcount
+        con.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_books_title ON books(title)")
+        logging.info(f"Migrated schema to v1: unique title index, removed {removed} duplicates")
+    if version < 2:
+        con.execute("""
+            CREATE TABLE IF NOT EXISTS page_hashes(
+                url TEXT PRIMARY KEY,
+                hash TEXT NOT NULL,
+                books TEXT NOT NULL,
+                updated_at TEXT NOT NULL
+            ) WITHOUT ROWID
+        """)
+        logging.info("Migrated schema to v2: page_hashes table")
+    if version < 3:
+        con.execute("""
+            CREATE TABLE IF NOT EXISTS crawl_state(
+                run_id TEXT PRIMARY KEY,
+                base_url TEXT NOT NULL,
+                last_page INTEGER NOT NULL,
+                frontier TEXT NOT NULL,
+                status TEXT NOT NULL,
+                updated_at TEXT NOT NULL
+            )
+        """)
+        logging.info("Migrated schema to v3: crawl_state checkpoints")
+    if version < 4:
+        columns = {row[1] for row in con.execute("PRAGMA table_info(books)")}
+        for column, kind in [("upc", "TEXT"), ("stock", "INTEGER"), ("category", "TEXT"),
+                             ("rating", "INTEGER"), ("description", "TEXT"), ("url", "TEXT")]:
+            if column not in columns:
+                con.execute(f"ALTER TABLE books ADD COLUMN {column} {kind}")
+        logging.info("Migrated schema to v4: detail-page columns")
+    if version < 5:
+        create_query_indexes(con)
+        logging.info("Migrated schema to v5: price and currency indexes")
+    if version < 6:
+        try:
+            create_search_index(con)
+            logging.info("Migrated schema to v6: FTS5 title search")
+        except sqlite3.OperationalError as e:
+            logging.warning(f"Full-text search unavailable, skipping: {e}")
+    if version < 7:
+        create_price_history(con)
+        recorded = con.execute(RECORD_ALL_PRICES, (None,)).rowcount
+        logging.info(f"Migrated schema to v7: price_history table, {recorded} current prices recorded")
+    if version < 8:
+        # Titles are unique per source site; '' is the built-in catalogue and imports without a source
+        columns = {row[1] for row in con.execute("PRAGMA table_info(books)")}
+        if "source" not in columns:
+            con.execute("ALTER TABLE books ADD COLUMN source TEXT NOT NULL DEFAULT ''")
+        con.execute("DROP INDEX IF EXISTS idx_books_title")
+        con.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_books_source_title ON books(source, title)")
+        con.execute("CREATE INDEX IF NOT EXISTS idx_books_title ON books(title)")
+        logging.info("Migrated schema to v8: source column, titles unique per source")
+    if version < 9:
+        con.execute("""
+            CREATE TABLE IF NOT EXISTS work_queue(
+                id INTEGER PRIMARY KEY,
+                run_id TEXT NOT NULL,
+                base_url TEXT NOT NULL,
+                first_page INTEGER NOT NULL,
+                last_page INTEGER NOT NULL,
+                status TEXT NOT NULL,
+                worker TEXT,
+                lease_expires REAL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                updated_at TEXT NOT NULL
+            )
+        """)
+        con.execute("CREATE INDEX IF NOT EXISTS idx_work_queue_status ON work_queue(status, id)")
+        logging.info("Migrated schema to v9: sharded crawl work queue")
+    con.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+# Save a crawl checkpoint
+UPSERT_CHECKPOINT = """
+    INSERT INTO crawl_state (run_id, base_url, last_page, frontier, status, updated_at)
+    VALUES (?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+    ON CONFLICT(run_id) DO UPDATE SET
+        last_page = excluded.last_page, frontier = excluded.frontier,
+        status = excluded.status, updated_at = excluded.updated_at
+"""
+
+# Crawl progress: every page up to last_page is committed, plus the out-of-order pages in frontier
+class Checkpoint:
+    def __init__(self, run_id, base_url, last_page=0, frontier=()):
+        self.run_id = run_id
+        self.base_url = base_url
+        self.last_page = last_page
+        self.frontier = set(frontier)
+        # Snapshot at resume time; pages committed during this run don't change what gets crawled
+        self.resumed_page = last_page
+        self.resumed_frontier = frozenset(frontier)
+
+    # Whether a page still has to be crawled
+    def needed(self, page):
+        return page > self.resumed_page and page not in self.resumed_frontier
+
+    def commit(self, pages):
+        self.frontier.update(pages)
+        while self.last_page + 1 in self.frontier:
+            self.last_page += 1
+            self.frontier.discard(self.last_page)
+
+    def row(self, status):
+        return (self.run_id, self.base_url, self.last_page, json.dumps(sorted(self.frontier)), status)
+
+# Secondary indexes backing --query filters
+def create_query_indexes(con):
+    con.execute("CREATE INDEX IF NOT EXISTS idx_books_price ON books(price)")
+    con.execute("CREATE INDEX IF NOT EXISTS idx_books_currency_price ON books(currency, price)")
+
+# Append-only price history (one row per observed change) and the latest price per book
+def create_price_history(con):
+    con.execute("""
+        CREATE TABLE IF NOT EXISTS price_history(
+            id INTEGER PRIMARY KEY,
+            book_id INTEGER NOT NULL REFERENCES books(id),
+            currency TEXT NOT NULL,
+            price REAL NOT NULL,
+            run_id TEXT,
+            scraped_at TEXT NOT NULL
+        )
+    """)
+    con.execute("CREATE INDEX IF NOT EXISTS idx_price_history_book ON price_history(book_id, scraped_at)")
+    con.execute("CREATE INDEX IF NOT EXISTS idx_price_history_time ON price_history(scraped_at, book_id)")
+    con.execute("""
+        CREATE VIEW IF NOT EXISTS current_price AS
+        SELECT h.book_id, b.title, h.currency, h.price, h.run_id, h.scraped_at
+        FROM price_history h JOIN books b ON b.id = h.book_id
+        WHERE h.id = (SELECT MAX(id) FROM price_history WHERE book_id = h.book_id)
+    """)
+
+# FTS5 index over titles, kept in sync with books by triggers
+def create_search_index(con):
+    con.execute("CREATE VIRTUAL TABLE IF NOT EXISTS books_fts USING fts5(title, content='books', content_rowid='id')")
+    con.execute("""
+        CREATE TRIGGER IF NOT EXISTS books_fts_insert AFTER INSERT ON books BEGIN
+            INSERT INTO books_fts(rowid, title) VALUES (new.id, new.title);
+        END
+    """)
+    con.execute("""
+        CREATE TRIGGER IF NOT EXISTS books_fts_delete AFTER DELETE ON books BEGIN
+            INSERT INTO books_fts(books_fts, rowid, title) VALUES ('delete', old.id, old.title);
+        END
+    """)
+    con.execute("""
+        CREATE TRIGGER IF NOT EXISTS books_fts_update AFTER UPDATE OF title ON books BEGIN
+            INSERT INTO books_fts(books_fts, rowid, title) VALUES ('delete', old.id, old.title);
+            INSERT INTO books_fts(rowid, title) VALUES (new.id, new.title);
+        END
+    """)
+    con.execute("INSERT INTO books_fts(books_fts) VALUES ('rebuild')")
+
+# Rebuild the search index from the books table
+def rebuild_search_index():
     try:
         with sqlite3.connect(DATABASE) as con:
-            cur = con.cursor()
-            cur.execute("SELECT id FROM books WHERE title = ? AND price = ?", (title, price))
-            if not cur.fetchone():
-                cur.execute(
-                    "INSERT INTO books (title, currency, price) VALUES (?, ?, ?)",
-                    (title, currency, price)
-                )
-                logging.info(f"Inserted: {title}")
-            else:
-                logging.info(f"Skipped duplicate: {title}")
+            create_search_index(con)
+        logging.info("Search index rebuilt.")
     except sqlite3.Error as e:
-        logging.error(f"Insert error: {e}")
-
-# Scrape single page
-def scrape_books(url):
+        logging.error(f"Search index error: {e}")
+
+# Batched writer on a single connection
+class BookWriter:
+    def __init__(self, database=DATABASE, batch_size=500):
+        self.con = sqlite3.connect(database, check_same_thread=False)
+        self.con.execute("PRAGMA journal_mode=WAL")
+        self.con.execute("PRAGMA synchronous=NORMAL")
+        self.con.execute("PRAGMA temp_store=MEMORY")
+        self.con.execute("PRAGMA cache_size=-65536")
+        self.batch_size = batch_size
+        self.buffer = []
+        self.details = []
+        self.pages = []
+        self.completed = []
+        self.checkpoint = None
+        self.written = 0
+        self.unchanged = 0
+        self.lock = threading.Lock()
+
+    # Queue books (and optionally the page's content hash), flushing once a full batch is buffered
+    def add(self, books, url=None, digest=None):
+        with self.lock:
+            self.buffer.extend((book.source, book.title, book.currency, book.price) for book in books)
+            if url is not None and digest is not None:
+                self.pages.append((url, digest, json.dumps(books, ensure_ascii=False, default=book_json)))
+            if len(self.buffer) >= self.batch_size:
+                self._flush()
+
+    # Queue full detail-page records
+    def add_details(self, books):
+        with self.lock:
+            self.details.extend({"source": "", **book} for book in books)
+            if len(self.buffer) + len(self.details) >= self.batch_size:
+                self._flush()
+
+    # Mark a page done; the checkpoint advances with the batch that commits its books
+    def complete_page(self, page):
+        with self.lock:
+            if self.checkpoint is not None:
+                self.completed.append(page)
+
+    # Record a new (or resumed) crawl run
+    def begin_run(self, checkpoint):
+        with self.lock:
+            self.checkpoint = checkpoint
+            with self.con:
+                self.con.execute(UPSERT_CHECKPOINT, checkpoint.row("running"))
+
+    def finish_run(self, status="complete"):
+        with self.lock:
+            self._flush()
+            if self.checkpoint is not None:
+                with self.con:
+                    self.con.execute(UPSERT_CHECKPOINT, self.checkpoint.row(status))
+                self.checkpoint = None
+
+    # Most recent run for a base URL, if it did not complete
+    def load_checkpoint(self, base_url):
+        with self.lock:
+            row = self.con.execute("""
+                SELECT run_id, last_page, frontier, status FROM crawl_state
+                WHERE base_url = ?
+                ORDER BY updated_at DESC, rowid DESC LIMIT 1
+            """, (base_url,)).fetchone()
+        if row is None or row[3] == "complete":
+            return None
+        return Checkpoint(row[0], base_url, row[1], json.loads(row[2]))
+
+    # Stored (hash, books) for a page from an earlier run
+    def page_hash(self, url):
+        with self.lock:
+            row = self.con.execute("SELECT hash FROM page_hashes WHERE url = ?", (url,)).fetchone()
+        return row[0] if row else None
+
+    def page_state(self, url):
+        with self.lock:
+            row = self.con.execute("SELECT hash, books FROM page_hashes WHERE url = ?", (url,)).fetchone()
+        if row is None:
+            return None, None
+        return row[0], [Book.from_dict(record) for record in json.loads(row[1])]
+
+    def flush(self):
+        with self.lock:
+            self._flush()
+
+    # Upsert the buffered rows, page hashes and checkpoint in one transaction
+    def _flush(self):
+        if not self.buffer and not self.details and not self.pages and not self.completed:
+            return
+        rows, self.buffer = self.buffer, []
+        details, self.details = self.details, []
+        pages, self.pages = self.pages, []
+        completed, self.completed = self.completed, []
+        start = time.perf_counter()
+        try:
+            with self.con:
+                # rowcount skips the FTS trigger writes that total_changes would include
+                written = self.con.executemany(UPSERT_BOOK, rows).rowcount
+                written += self.con.executemany(UPSERT_BOOK_DETAIL, details).rowcount
+                if written:
+                    run_id = self.checkpoint.run_id if self.checkpoint is not None else None
+                    keys = [row[:2] for row in rows] + [(book["source"], book["title"]) for book in details]
+                    self.con.executemany(RECORD_PRICE, ((run_id, source, title) for source, title in keys))
+                self.con.executemany(UPSERT_PAGE_HASH, pages)
+                if self.checkpoint is not None and completed:
+                    self.checkpoint.commit(completed)
+                    self.con.execute(UPSERT_CHECKPOINT, self.checkpoint.row("running"))
+        except sqlite3.Error as e:
+            logging.error(f"Insert error: {e}")
+            return
+        elapsed = time.perf_counter() - start
+        count = len(rows) + len(details)
+        self.written += written
+        self.unchanged += count - written
+        metrics.observe("write_seconds", elapsed)
+        metrics.count("records", count)
+        metrics.count("records_written", written)
+        if count and elapsed:
+            metrics.observe("write_records_per_second", count / elapsed)
+        logging.debug(f"Wrote {written} books, {count - written} unchanged in {elapsed * 1000:.1f}ms")
+
+    def close(self):
+        self.flush()
+        self.con.close()
+
+writer = None
+
+# Shared writer, opened on first use
+def get_writer():
+    global writer
+    if writer is None:
+        writer = BookWriter()
+    return writer
+
+# Start a crawl run, or continue the last unfinished one for this URL
+def start_run(base_url, resume=False):
+    checkpoint = get_writer().load_checkpoint(base_url) if resume else None
+    if checkpoint is None:
+        if resume:
+            logging.info("No unfinished run to resume, starting a new one")
+        import uuid
+        checkpoint = Checkpoint(uuid.uuid4().hex[:12], base_url)
+    else:
+        logging.info(
+            f"Resuming run {checkpoint.run_id} after page {checkpoint.last_page} "
+            f"({len(checkpoint.frontier)} later pages already done)"
+        )
+    get_writer().begin_run(checkpoint)
+    return checkpoint
+
+# Replace the shared writer (from CLI options)
+def configure_writer(**options):
+    global writer
+    if writer is not None:
+        writer.close()
+    writer = BookWriter(**options)
+    return writer
+
+# Flush and close the shared writer
+def close_writer():
+    global writer
+    if writer is not None:
+        writer.close()
+        writer = None
+
+# Seconds to wait from a Retry-After header (delta-seconds or HTTP date)
+def retry_after_seconds(response):
+    value = response.headers.get("Retry-After") if response is not None else None
+    if not value:
+        return None
     try:
-        response = requests.get(url)
-        response.raise_for_status()
-    except requests.RequestException as e:
-        logging.error(f"Request error: {e}")
-        return []
-
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        from email.utils import parsedate_to_datetime
+        return max(0.0, (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+# Per-host token bucket, with an optional AIMD limit on requests in flight
+class HostThrottle:
+    def __init__(self, max_rps=None, adaptive=False, max_in_flight=32, latency_target=2.0):
+        self.rate = max_rps
+        self.burst = max(1.0, max_rps or 1.0)
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+        self.limit = 2.0 if adaptive else None
+        self.max_in_flight = max_in_flight
+        self.latency_target = latency_target
+        self.in_flight = 0
+        self.paused_until = 0.0
+        self.last_decrease = 0.0
+        self.cond = threading.Condition()
+
+    # Block until the host's rate, in-flight limit and any Retry-After pause allow a request
+    def acquire(self):
+        with self.cond:
+            while True:
+                now = time.monotonic()
+                if now < self.paused_until:
+                    self.cond.wait(self.paused_until - now)
+                    continue
+                if self.limit is not None and self.in_flight >= int(self.limit):
+                    self.cond.wait()
+                    continue
+                if self.rate:
+                    self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                    self.updated = now
+                    if self.tokens < 1:
+                        self.cond.wait((1 - self.tokens) / self.rate)
+                        continue
+                    self.tokens -= 1
+                self.in_flight += 1
+                return
+
+    # Additive increase while healthy, multiplicative decrease on 429/503, errors or slow responses
+    def release(self, latency, status=None, retry_after=None):
+        with self.cond:
+            self.in_flight -= 1
+            now = time.monotonic()
+            if self.limit is not None:
+                if status is None or status in (429, 503) or latency > self.latency_target:
+                    # At most one decrease per latency window, so a burst of errors halves once
+                    if now - self.last_decrease > self.latency_target:
+                        self.limit = max(1.0, self.limit / 2)
+                        self.last_decrease = now
+                else:
+                    self.limit = min(self.max_in_flight, self.limit + 1 / self.limit)
+            if retry_after:
+                self.paused_until = max(self.paused_until, now + retry_after)
+            self.cond.notify_all()
+
+# A page that could not be downloaded (retries exhausted or an HTTP error), as opposed to a 404
+class FetchError(Exception):
+    pass
+
+# Pooled HTTP session with timeouts, retries and latency stats
+class Fetcher:
+    def __init__(self, pool_size=10, connect_timeout=5.0, read_timeout=30.0, retries=3, backoff=0.5,
+                 max_rps=None, adaptive=False, max_in_flight=32, latency_target=2.0):
+        import requests
+        from requests.adapters import HTTPAdapter
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.timeout = (connect_timeout, read_timeout)
+        self.retries = retries
+        self.backoff = backoff
+        self.latencies = []
+        self.retried = 0
+        self.failed = 0
+        self.lock = threading.Lock()
+        self.throttle_options = None
+        if max_rps or adaptive:
+            self.throttle_options = {
+                "max_rps": max_rps,
+                "adaptive": adaptive,
+                "max_in_flight": max_in_flight,
+                "latency_target": latency_target,
+            }
+        self.throttles = {}
+
+    # Throttle for the URL's host, created on first use
+    def throttle(self, url):
+        if self.throttle_options is None:
+            return None
+        host = urlsplit(url).netloc
+        with self.lock:
+            if host not in self.throttles:
+                self.throttles[host] = HostThrottle(**self.throttle_options)
+            return self.throttles[host]
+
+    # Exponential backoff with jitter, or the server's Retry-After if longer
+    def sleep_before_retry(self, attempt, retry_after=None):
+        delay = self.backoff * (2 ** attempt) * random.uniform(0.5, 1.5)
+        time.sleep(max(delay, retry_after or 0.0))
+
+    def record(self, latency):
+        with self.lock:
+            self.latencies.append(latency)
+
+    # Start a new statistics window (the daemon does this every refresh cycle)
+    def reset_stats(self):
+        with self.lock:
+            self.latencies = []
+            self.retried = 0
+            self.failed = 0
+
+    # GET with retries on 429/5xx and connection errors; None when the page is gone, FetchError when it failed
+    def get(self, url, headers=None):
+        import requests
+        throttle = self.throttle(url)
+        for attempt in range(self.retries + 1):
+            if throttle is not None:
+                throttle.acquire()
+            start = time.perf_counter()
+            response = None
+            try:
+                response = self.session.get(url, headers=headers, timeout=self.timeout)
+            except requests.RequestException as e:
+                error = e
+            latency = time.perf_counter() - start
+            self.record(latency)
+            metrics.observe("fetch_seconds", latency)
+            if response is not None:
+                metrics.observe("fetch_bytes", len(response.content))
+            retry_after = retry_after_seconds(response)
+            if throttle is not None:
+                throttle.release(latency, response.status_code if response is not None else None, retry_after)
+
+            if response is not None:
+                if response.status_code not in RETRY_STATUSES:
+                    if response.status_code == 404:
+                        logging.debug(f"Not found: {url}")
+                        return None
+                    try:
+                        response.raise_for_status()
+                    except requests.RequestException as e:
+                        logging.error(f"Request error: {e}")
+                        with self.lock:
+                            self.failed += 1
+                        raise FetchError(str(e))
+                    return response
+                error = f"HTTP {response.status_code}"
+
+            if attempt < self.retries:
+                logging.warning(f"Retrying {url} after {error} (attempt {attempt + 1}/{self.retries})")
+                with self.lock:
+                    self.retried += 1
+                self.sleep_before_retry(attempt, retry_after)
+
+        logging.error(f"Giving up on {url}: {error}")
+        with self.lock:
+            self.failed += 1
+        raise FetchError(f"Giving up on {url}: {error}")
+
+    def stats(self):
+        with self.lock:
+            latencies = sorted(self.latencies)
+        if not latencies:
+            return {"requests": 0, "retried": self.retried, "failed": self.failed}
+        return {
+            "requests": len(latencies),
+            "retried": self.retried,
+            "failed": self.failed,
+            "mean": sum(latencies) / len(latencies),
+            "p50": latencies[len(latencies) // 2],
+            "p95": latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))],
+            "max": latencies[-1],
+        }
+
+    def log_stats(self):
+        stats = self.stats()
+        if not stats["requests"]:
+            return
+        logging.info(
+            f"HTTP: {stats['requests']} requests, {stats['retried']} retried, {stats['failed']} failed, "
+            f"latency mean {stats['mean'] * 1000:.1f}ms p50 {stats['p50'] * 1000:.1f}ms "
+            f"p95 {stats['p95'] * 1000:.1f}ms max {stats['max'] * 1000:.1f}ms"
+        )
+        for host, throttle in self.throttles.items():
+            if throttle.limit is not None:
+                logging.info(f"Adaptive limit for {host}: {throttle.limit:.1f} requests in flight")
+
+fetcher = None
+
+# Shared fetcher, created on first use
+def get_fetcher():
+    global fetcher
+    if fetcher is None:
+        fetcher = Fetcher()
+    return fetcher
+
+# Replace the shared fetcher (from CLI options)
+def configure_fetcher(**options):
+    global fetcher
+    fetcher = Fetcher(**options)
+    return fetcher
+
+# Fetch page HTML; None when the page is gone
+def fetch_page(url):
+    response = get_fetcher().get(url)
+    if response is None:
+        return None
+    return response.text
+
+# Compact listing record: four slots instead of a per-record dict, currency and source interned
+class Book:
+    __slots__ = ("title", "currency", "price", "source")
+
+    def __init__(self, title, currency, price, source=""):
+        self.title = title
+        self.currency = sys.intern(currency)
+        self.price = price
+        self.source = sys.intern(source)
+
+    @classmethod
+    def from_dict(cls, record):
+        return cls(record["title"], record["currency"], record["price"], record.get("source", ""))
+
+    # Read-only mapping-style access, so sinks treat books and detail dicts alike
+    def get(self, field, default=None):
+        return getattr(self, field) if field in self.__slots__ else default
+
+    def to_dict(self):
+        record = {"title": self.title, "currency": self.currency, "price": self.price}
+        if self.source:
+            record["source"] = self.source
+        return record
+
+    # Pickle as a plain tuple: parser processes hand books back cheaply
+    def __reduce__(self):
+        return Book, (self.title, self.currency, self.price, self.source)
+
+    def __eq__(self, other):
+        if not isinstance(other, Book):
+            return NotImplemented
+        return (self.title, self.currency, self.price, self.source) == (other.title, other.currency, other.price, other.source)
+
+    def __repr__(self):
+        return f"Book({self.title!r}, {self.currency!r}, {self.price!r}, {self.source!r})"
+
+# JSON encoding for Book records (exports, page hashes and the page cache)
+def book_json(obj):
+    if isinstance(obj, Book):
+        return obj.to_dict()
+    raise TypeError(f"{type(obj).__name__} is not JSON serializable")
+
+# Build a book record from the card's title and price text
+def make_book(title, price_text):
+    price_text = price_text.strip()
+    return Book(title, price_text[0], float(price_text[1:]))
+
+# Parse book cards with BeautifulSoup (reference backend)
+def parse_books_bs4(html):
+    from bs4 import BeautifulSoup
     books = []
-    soup = BeautifulSoup(response.text, "html.parser")
+    soup = BeautifulSoup(html, "html.parser")
     book_elements = soup.find_all("article", class_="product_pod")
 
     for book in book_elements:
         try:
             title = book.h3.a['title']
             price_text = book.find("p", class_="price_color").text
-            currency = price_text[0]
-            price = float(price_text[1:])
-
-            books.append({"title": title, "currency": currency, "price": price})
-            insert_book(title, currency, price)
+            books.append(make_book(title, price_text))
         except Exception as e:
             logging.warning(f"Error parsing book: {e}")
-
-    logging.info(f"Scraped {len(books)} books from {url}")
     return books
 
-# Scrape all pages
-def scrape_all_pages(base_url):
-    page = 1
-    all_books = []
-    while True:
-        page_url = f"{base_url}catalogue/page-{page}.html"
-        books = scrape_books(page_url)
-        if not books:
-            break
-        all_books.extend(books)
-        page += 1
-    logging.info(f"Scraping complete. Total books: {len(all_books)}")
-    return all_books
-
-# Save JSON
-def save_to_json(books, filename=JSON_FILE):
-    try:
-        with open(filename, "w", encoding="utf-8") as f:
-            json.dump(books, f, ensure_ascii=False, indent=4)
-        logging.info(f"Saved to {filename}")
-    except Exception as e:
-        logging.error(f"JSON save error: {e}")
-
-# Save CSV
-def save_to_csv(books, filename=CSV_FILE):
-    try:
-        with open(filename, "w", newline="", encoding="utf-8") as f:
-            writer = csv.DictWriter(f, fieldnames=["title", "currency", "price"])
-            writer.writeheader()
-            writer.writerows(books)
-        logging.info(f"Saved to {filename}")
-    except Exception as e:
-        logging.error(f"CSV save error: {e}")
-
-# Import CSV to DB
-def import_csv_to_db(csv_file):
-    try:
-        with sqlite3.connect(DATABASE) as con, open(csv_file, "r", encoding="utf-8") as f:
-            cur = con.cursor()
-            reader = csv.DictReader(f)
-            for row in reader:
-                cur.execute(
-                    "INSERT INTO books (title, currency, price) VALUES (?, ?, ?)",
-                    (row["title"], row["currency"], float(row["price"]))
-                )
-        logging.info(f"Imported CSV: {csv_file}")
-    except Exception as e:
-        logging.error(f"CSV import error: {e}")
-
-# Display books
-def display_books():
-    try:
-        with sqlite3.connect(DATABASE) as con:
-            cur = con.cursor()
-            cur.execute("SELECT * FROM books")
-            rows = cur.fetchall()
-            headers = [description[0] for description in cur.description]
-            if rows:
-                print("\n📚 Books in Database:\n")
-                print(tabulate(rows, headers=headers, tablefmt="fancy_grid"))
-            else:
-                logging.info("Database is empty.")
-    except sqlite3.Error as e:
-        logging.error(f"Display error: {e}")
-
-# CLI Arguments
-def parse_args():
-    parser = argparse.ArgumentParser(description="Books Scraper CLI")
-    parser.add_argument("--scrape", action="store_true", help="Scrape all books")
-    parser.add_argument("--display", action="store_true", help="Display all books")
-    parser.add_argument("--export", action="store_true", help="Export books to JSON and CSV")
-    return parser.parse_args()
-
-# Main execution
-def main():
-    create_table()
-    args = parse_args()
-
-    if args.scrape:
-        books = scrape_all_pages(URL)
-        if args.export:
-            save_to_json(books)
-            save_to_csv(books)
+# Import lxml and compile the XPath for the CSS selectors, once
+def load_lxml():
+    global etree, lxml_html, LXML_BOOK, LXML_TITLE, LXML_PRICE
+    if lxml_html is None:
+        from lxml import etree, html as lxml_html
+        LXML_BOOK = etree.XPath("//article[contains(concat(' ', normalize-space(@class), ' '), ' product_pod ')]")
+        LXML_TITLE = etree.XPath(".//h3//a[@title]/@title")
+        LXML_PRICE = etree.XPath(".//p[contains(concat(' ', normalize-space(@class), ' '), ' price_color ')]")
+    return lxml_html
+
+# Parse book cards with lxml, using the precompiled XPath
+def parse_books_lxml(html):
+    load_lxml()
+    books = []
+    tree = lxml_html.fromstring(html)
 
-    if args.display:
-        display_books()
+    for book in LXML_BOOK(tree):
+        try:
+            title = str(LXML_TITLE(book)[0])
+            price_text = LXML_PRICE(book)[0].text_content()
+            books.append(make_book(title, price_text))
+        except Exception as e:
+            logging.warning(f"Error parsing book: {e}")
+    return books
 
-if __name__ == "__main__":
-    main()
-import requests
-import sqlite3
-import json
-import csv
-import logging
-import argparse
-from bs4 import BeautifulSoup
-from tabulate import tabulate
+# Import selectolax's HTML parser: the lexbor backend when available, else the older one
+def load_selectolax():
+    global HTMLParser
+    if HTMLParser is None:
+        try:
+            from selectolax.lexbor import LexborHTMLParser as HTMLParser
+        except ImportError:
+            from selectolax.parser import HTMLParser
+    return HTMLParser
 
-# Configuration
-DATABASE = "books.sqlite3"
-JSON_FILE = "books.json"
-CSV_FILE = "books.csv"
-URL = "http://books.toscrape.com/"
+# Parse book cards with selectolax CSS selectors
+def parse_books_selectolax(html):
+    books = []
+    tree = load_selectolax()(html)
 
-# Logging setup
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler("books_scraper.log"),
-        logging.StreamHandler()
-    ]
-)
+    for book in tree.css("article.product_pod"):
+        try:
+            title = book.css_first("h3 a[title]").attributes["title"]
+            price_text = book.css_first("p.price_color").text()
+            books.append(make_book(title, price_text))
+        except Exception as e:
+            logging.warning(f"Error parsing book: {e}")
+    return books
 
-# Create table
-def create_table():
-    with sqlite3.connect(DATABASE) as con:
-        cur = con.cursor()
-        cur.execute("""
-            CREATE TABLE IF NOT EXISTS books(
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                title TEXT NOT NULL,
-                currency TEXT NOT NULL,
-                price REAL NOT NULL
-            );
-        """)
-    logging.info("Database table ready.")
+# Available parser backends, keyed by --parser name
+PARSERS = {"html.parser": parse_books_bs4}
+if HAVE_LXML:
+    PARSERS["lxml"] = parse_books_lxml
+if HAVE_SELECTOLAX:
+    PARSERS["selectolax"] = parse_books_selectolax
+
+parser_name = "html.parser"
+
+# Select the parser backend used by parse_books
+def configure_parser(name):
+    global parser_name
+    if name not in PARSERS:
+        raise ValueError(f"Unknown parser {name!r}, available: {', '.join(PARSERS)}")
+    parser_name = name
+
+# Parse book cards from page HTML
+def parse_books(html, parser=None):
+    start = time.perf_counter()
+    books = PARSERS[parser or parser_name](html)
+    metrics.observe("parse_seconds", time.perf_counter() - start)
+    return books
 
-# Insert book with duplicate check
-def insert_book(title, currency, price):
+# Time every backend over saved pages and check they agree with the reference
+def benchmark_parsers(files, rounds=20):
+    pages = []
+    for path in files:
+        with open(path, "r", encoding="utf-8") as f:
+            pages.append(f.read())
+
+    reference = [parse_books_bs4(page) for page in pages]
+    results = []
+    for name, parse in PARSERS.items():
+        matches = [parse(page) for page in pages] == reference
+        start = time.perf_counter()
+        for _ in range(rounds):
+            for page in pages:
+                parse(page)
+        elapsed = time.perf_counter() - start
+        results.append([name, f"{len(pages) * rounds / elapsed:.1f}", "yes" if matches else "NO"])
+        if not matches:
+            logging.error(f"Parser {name} disagrees with html.parser")
+
+    from tabulate import tabulate
+    print(tabulate(results, headers=["parser", "pages/sec", "matches reference"], tablefmt="fancy_grid"))
+    return results
+
+# Read "Page 1 of N" from the pager
+PAGER_RE = re.compile(r'<li class="current">\s*Page\s+\d+\s+of\s+(\d+)')
+
+def parse_page_count(html):
+    match = PAGER_RE.search(html)
+    if match:
+        return int(match.group(1))
+    return None
+
+# Field parsers for site profiles: selected text or attribute -> record fields
+def parse_price_field(field, value):
+    book = make_book("", value)
+    return {"currency": book.currency, "price": book.price}
+
+FIELD_PARSERS = {
+    "text": lambda field, value: {field: value.strip()},
+    "float": lambda field, value: {field: float(re.sub(r"[^\d.-]", "", value))},
+    "price": parse_price_field,
+}
+
+# A catalogue site: base URL, pagination and CSS selectors, compiled once when the profile is loaded
+class Profile:
+    def __init__(self, name, base_url, page_path=PAGE_PATH, pagination="pager", pager_pattern=None,
+                 record="article.product_pod", fields=None):
+        import soupsieve
+        if pagination not in ("pager", "probe"):
+            raise ValueError(f"Profile {name}: pagination must be 'pager' or 'probe', not {pagination!r}")
+        self.name = name
+        self.base_url = base_url if base_url.endswith("/") else base_url + "/"
+        self.page_path = page_path
+        self.pager = None
+        if pagination == "pager":
+            self.pager = re.compile(pager_pattern) if pager_pattern else PAGER_RE
+        self.record = soupsieve.compile(record)
+        fields = fields or {
+            "title": {"selector": "h3 a", "attribute": "title"},
+            "price": {"selector": "p.price_color", "parse": "price"},
+        }
+        self.fields = []
+        for field, spec in fields.items():
+            if field not in FIELDS:
+                raise ValueError(f"Profile {name}: unknown field {field!r}, profiles fill {', '.join(FIELDS)}")
+            parse = spec.get("parse", "text")
+            if parse not in FIELD_PARSERS:
+                raise ValueError(f"Profile {name}: unknown parser {parse!r} for {field}")
+            self.fields.append((field, soupsieve.compile(spec["selector"]), spec.get("attribute"), FIELD_PARSERS[parse]))
+        produced = set()
+        for field, _, _, parse in self.fields:
+            produced |= {"currency", "price"} if parse is parse_price_field else {field}
+        missing = set(FIELDS) - produced
+        if missing:
+            raise ValueError(f"Profile {name}: no field yields {', '.join(sorted(missing))}")
+
+    # Page count from the pager, or None when pages are probed until one comes back empty
+    def page_count(self, html):
+        if self.pager is None:
+            return None
+        match = self.pager.search(html)
+        return int(match.group(1)) if match else None
+
+    def parse(self, html):
+        from bs4 import BeautifulSoup
+        start = time.perf_counter()
+        books = []
+        soup = BeautifulSoup(html, BS4_FEATURES)
+        for element in self.record.select(soup):
+            try:
+                record = {"source": self.name}
+                for field, selector, attribute, parse in self.fields:
+                    node = selector.select_one(element)
+                    value = node[attribute] if attribute else node.get_text()
+                    # bs4 returns multi-valued attributes such as class as lists
+                    record.update(parse(field, " ".join(value) if isinstance(value, list) else value))
+                books.append(Book.from_dict(record))
+            except Exception as e:
+                logging.warning(f"Error parsing book on {self.name}: {e}")
+        metrics.observe("parse_seconds", time.perf_counter() - start)
+        return books
+
+# Load site profiles from a TOML file: one table per site, named by its source
+def load_profiles(path):
     try:
-        with sqlite3.connect(DATABASE) as con:
-            cur = con.cursor()
-            cur.execute("SELECT id FROM books WHERE title = ? AND price = ?", (title, price))
-            if not cur.fetchone():
-                cur.execute(
-                    "INSERT INTO books (title, currency, price) VALUES (?, ?, ?)",
-                    (title, currency, price)
-                )
-                logging.info(f"Inserted: {title}")
-            else:
-                logging.info(f"Skipped duplicate: {title}")
-    except sqlite3.Error as e:
-        logging.error(f"Insert error: {e}")
+        import tomllib
+    except ImportError:
+        import tomli as tomllib
+    with open(path, "rb") as f:
+        config = tomllib.load(f)
+    profiles = []
+    for name, options in config.items():
+        try:
+            profiles.append(Profile(name, **options))
+        except TypeError as e:
+            raise ValueError(f"Profile {name}: {e}")
+    return profiles
+
+# On-disk cache of page validators and parsed books, evicted least recently used first
+class PageCache:
+    def __init__(self, directory, max_bytes=64 * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self.size = sum(os.path.getsize(path) for path in self.files())
+
+    def path(self, url):
+        return os.path.join(self.directory, hashlib.sha1(url.encode("utf-8")).hexdigest() + ".json")
+
+    def files(self):
+        return [os.path.join(self.directory, name) for name in os.listdir(self.directory) if name.endswith(".json")]
+
+    def lookup(self, url):
+        try:
+            with open(self.path(url), "r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if entry.get("url") != url:
+            return None
+        entry["books"] = [Book.from_dict(record) for record in entry["books"]]
+        return entry
+
+    # Mark an entry as recently used
+    def hit(self, url):
+        try:
+            os.utime(self.path(url))
+        except OSError:
+            pass
+        with self.lock:
+            self.hits += 1
+
+    # digest is the page's hash in page_hashes, tying the entry to the database it was stored with
+    def store(self, url, validators, books, page_count=None, digest=None):
+        if not validators:
+            return
+        entry = {"url": url, **validators, "hash": digest, "page_count": page_count, "books": books}
+        data = json.dumps(entry, ensure_ascii=False, default=book_json).encode("utf-8")
+        path = self.path(url)
+        with self.lock:
+            old_size = os.path.getsize(path) if os.path.exists(path) else 0
+            tmp = f"{path}.{threading.get_ident()}.tmp"
+            with open(tmp, "wb") as f:
+                f.write(data)
+            os.replace(tmp, path)
+            self.size += len(data) - old_size
+            if self.size > self.max_bytes:
+                self.evict()
+
+    # Drop least recently used entries until the cache is back under 90% of its limit
+    def evict(self):
+        for path in sorted(self.files(), key=os.path.getmtime):
+            if self.size <= self.max_bytes * 0.9:
+                break
+            self.size -= os.path.getsize(path)
+            os.remove(path)
+
+cache = None
+
+# Enable the on-disk page cache (from CLI options)
+def configure_cache(directory, max_bytes):
+    global cache
+    cache = PageCache(directory, max_bytes) if directory else None
+    return cache
+
+skip_unchanged = True
+page_stats = Counter()
+page_stats_lock = threading.Lock()
+
+def count_page(kind):
+    with page_stats_lock:
+        page_stats[kind] += 1
+
+# Fast hash of the product_pod section, ignoring the page chrome around it
+def content_hash(content):
+    start = content.find(b'<article class="product_pod"')
+    end = content.rfind(b"</article>")
+    if start != -1 and end > start:
+        content = content[start:end]
+    return hashlib.blake2b(content, digest_size=16).hexdigest()
+
+# Books from the last run if the page's content hash is unchanged, else None
+def unchanged_books(url, digest):
+    if not skip_unchanged:
+        return None
+    stored_hash, books = get_writer().page_state(url)
+    if stored_hash != digest:
+        return None
+    count_page("unchanged")
+    logging.debug(f"Unchanged: {url}")
+    return books
 
-# Scrape single page
-def scrape_books(url):
+# Validators worth revalidating with next time
+def response_validators(response):
+    validators = {}
+    if response.headers.get("ETag"):
+        validators["etag"] = response.headers["ETag"]
+    if response.headers.get("Last-Modified"):
+        validators["last_modified"] = response.headers["Last-Modified"]
+    return validators
+
+# GET a page, sending conditional headers when the cache has an entry; returns (response, entry)
+def fetch_with_cache(url):
+    # --full re-downloads and re-parses every page, so it never revalidates
+    entry = cache.lookup(url) if cache is not None and skip_unchanged else None
+    # Only revalidate while the database still holds the page the entry was cached from
+    if entry is not None and (entry.get("hash") is None or entry["hash"] != get_writer().page_hash(url)):
+        entry = None
+    headers = {}
+    if entry is not None:
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+    response = get_fetcher().get(url, headers=headers or None)
+    if response is not None and response.status_code == 304 and entry is not None:
+        cache.hit(url)
+        count_page("not_modified")
+        logging.debug(f"Not modified: {url}")
+        return response, entry
+    return response, None
+
+# Page count from the pager of a page, using the cache when possible
+def fetch_page_count(url, profile=None):
+    response, entry = fetch_with_cache(url)
+    if response is None:
+        return None
+    if entry is not None:
+        return entry.get("page_count")
+    return profile.page_count(response.text) if profile else parse_page_count(response.text)
+
+# Fetch, parse and store one page; unchanged pages come from the cache without parsing or writing
+def load_page(url, profile=None):
+    books, page_count, _ = load_page_status(url, profile)
+    return books, page_count
+
+# load_page, also reporting whether the page was "processed", "unchanged", "not_modified", "missing" or "failed"
+def load_page_status(url, profile=None):
     try:
-        response = requests.get(url)
-        response.raise_for_status()
-    except requests.RequestException as e:
-        logging.error(f"Request error: {e}")
-        return []
+        response, entry = fetch_with_cache(url)
+    except FetchError:
+        count_page("failed")
+        return [], None, "failed"
+    if response is None:
+        return [], None, "missing"
+    if entry is not None:
+        return entry["books"], entry.get("page_count"), "not_modified"
+
+    html = response.text
+    page_count = profile.page_count(html) if profile else parse_page_count(html)
+    digest = content_hash(response.content)
+    if profile is not None:
+        # The same page parsed under another profile is not "unchanged" for this one
+        digest = f"{profile.name}:{digest}"
+    books = unchanged_books(url, digest)
+    if books is not None:
+        if cache is not None:
+            cache.store(url, response_validators(response), books, page_count, digest)
+        return books, page_count, "unchanged"
+
+    books = profile.parse(html) if profile else parse_books(html)
+    count_page("processed")
+    get_writer().add(books, url, digest)
+    if cache is not None:
+        cache.store(url, response_validators(response), books, page_count, digest)
+
+    logging.debug(f"Scraped {len(books)} books from {url}")
+    return books, page_count, "processed"
+
+# Scrape single page into a list (runs inside worker threads)
+def scrape_page(url, html=None, profile=None):
+    if html is None:
+        return load_page(url, profile)[0]
+
+    books = profile.parse(html) if profile else parse_books(html)
+    get_writer().add(books)
+
+    logging.debug(f"Scraped {len(books)} books from {url}")
+    return books
 
-    books = []
-    soup = BeautifulSoup(response.text, "html.parser")
-    book_elements = soup.find_all("article", class_="product_pod")
+# Scrape single page, yielding records
+def scrape_books(url, html=None):
+    yield from scrape_page(url, html)
 
-    for book in book_elements:
-        try:
-            title = book.h3.a['title']
-            price_text = book.find("p", class_="price_color").text
-            currency = price_text[0]
-            price = float(price_text[1:])
+# Build catalogue page URL
+def page_url(base_url, page, page_path=PAGE_PATH):
+    return f"{base_url}{page_path.format(page=page)}"
 
-            books.append({"title": title, "currency": currency, "price": price})
-            insert_book(title, currency, price)
-        except Exception as e:
-            logging.warning(f"Error parsing book: {e}")
+# Whether a page still has to be crawled in this run
+def page_needed(checkpoint, page):
+    return checkpoint is None or checkpoint.needed(page)
 
-    logging.info(f"Scraped {len(books)} books from {url}")
-    return books
+# Scrape all pages, yielding records in page order
+def scrape_all_pages(base_url, concurrency=1, checkpoint=None, profile=None):
+    if concurrency > 1:
+        yield from scrape_all_pages_concurrent(base_url, concurrency, checkpoint, profile)
+        return
 
-# Scrape all pages
-def scrape_all_pages(base_url):
+    page_path = profile.page_path if profile else PAGE_PATH
     page = 1
-    all_books = []
+    total = 0
+    failures = 0
     while True:
-        page_url = f"{base_url}catalogue/page-{page}.html"
-        books = scrape_books(page_url)
+        if not page_needed(checkpoint, page):
+            page += 1
+            continue
+        books, _, status = load_page_status(page_url(base_url, page, page_path), profile)
+        if status == "failed":
+            # Skipped, not completed: the crawl goes on and --resume retries it
+            failures += 1
+            if failures >= MAX_FAILED_PAGES:
+                logging.error(f"Stopping after {failures} failed pages in a row")
+                break
+            page += 1
+            continue
+        failures = 0
         if not books:
             break
-        all_books.extend(books)
+        get_writer().complete_page(page)
+        total += len(books)
+        yield from books
         page += 1
-    logging.info(f"Scraping complete. Total books: {len(all_books)}")
-    return all_books
-
-# Save JSON
-def save_to_json(books, filename=JSON_FILE):
+    get_writer().flush()
+    logging.info(f"Scraping complete. Total books: {total}")
+
+# Books of the pages a resumed run committed before the resume, from their stored page records
+def committed_books(checkpoint):
+    pages = sorted(set(range(1, checkpoint.resumed_page + 1)) | checkpoint.resumed_frontier)
+    for page in pages:
+        _, books = get_writer().page_state(page_url(checkpoint.base_url, page))
+        yield from books or []
+
+# Map over items with at most `window` tasks in flight, yielding results in order
+def bounded_map(pool, fn, items, window):
+    pending = deque()
     try:
-        with open(filename, "w", encoding="utf-8") as f:
-            json.dump(books, f, ensure_ascii=False, indent=4)
-        logging.info(f"Saved to {filename}")
-    except Exception as e:
-        logging.error(f"JSON save error: {e}")
-
-# Save CSV
-def save_to_csv(books, filename=CSV_FILE):
+        for item in items:
+            pending.append(pool.submit(fn, item))
+            if len(pending) >= window:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+    finally:
+        for future in pending:
+            future.cancel()
+
+# Scrape all pages with a thread pool, keeping page order
+def scrape_all_pages_concurrent(base_url, concurrency, checkpoint=None, profile=None):
+    page_path = profile.page_path if profile else PAGE_PATH
+    status = None
+    if page_needed(checkpoint, 1):
+        first_books, last_page, status = load_page_status(page_url(base_url, 1, page_path), profile)
+        if first_books:
+            get_writer().complete_page(1)
+    else:
+        # Already committed: only the pager is needed
+        first_books = []
+        try:
+            last_page = fetch_page_count(page_url(base_url, 1, page_path), profile)
+        except FetchError:
+            last_page = None
+    total = len(first_books)
+    yield from first_books
+
+    if last_page is not None:
+        logging.info(f"Pager reports {last_page} pages, fetching with {concurrency} workers")
+        pages = range(2, last_page + 1)
+    elif first_books or status in (None, "failed"):
+        # No pager: probe ahead speculatively, stop at the first empty page
+        pages = itertools.count(2)
+    else:
+        pages = []
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        def scrape(page):
+            books, _, status = load_page_status(page_url(base_url, page, page_path), profile)
+            return page, books, status
+
+        pages = (page for page in pages if page_needed(checkpoint, page))
+        failures = 0
+        for page, books, status in bounded_map(pool, scrape, pages, concurrency * 2):
+            if status == "failed":
+                # Skipped, not completed: the crawl goes on and --resume retries it
+                failures += 1
+                if last_page is None and failures >= MAX_FAILED_PAGES:
+                    logging.error(f"Stopping after {failures} failed pages in a row")
+                    break
+                continue
+            failures = 0
+            if not books and last_page is None:
+                break
+            if books:
+                get_writer().complete_page(page)
+            total += len(books)
+            yield from books
+
+    get_writer().flush()
+    logging.info(f"Scraping complete. Total books: {total}")
+
+# Parse raw page bytes in a parser process (the parent records parse_seconds; metrics here would be lost)
+def parse_page(content, encoding, parser):
+    start = time.perf_counter()
+    books = PARSERS[parser](content.decode(encoding or "utf-8", errors="replace"))
+    return books, time.perf_counter() - start
+
+# Log items, busy time and sustainable rate for each pipeline stage
+def log_stage_stats(stats, elapsed):
+    for stage, stat in stats.items():
+        capacity = stat["items"] * stat["workers"] / stat["busy"] if stat["busy"] else 0.0
+        logging.info(
+            f"Stage {stage}: {stat['workers']} workers, {stat['items']} {stat['unit']}, "
+            f"busy {stat['busy']:.2f}s, {stat['items'] / elapsed:.1f} {stat['unit']}/sec actual, "
+            f"{capacity:.1f} {stat['unit']}/sec capacity"
+        )
+
+# Fetch threads -> bounded queue -> parser processes -> single writer thread
+def scrape_pipeline(base_url, fetch_workers=4, parse_workers=None, queue_size=64, checkpoint=None):
+    parse_workers = parse_workers or os.cpu_count() or 1
+    started = time.perf_counter()
+    # Pages that failed to download: skipped in the output and left for --resume
+    failed = set()
     try:
-        with open(filename, "w", newline="", encoding="utf-8") as f:
-            writer = csv.DictWriter(f, fieldnames=["title", "currency", "price"])
-            writer.writeheader()
-            writer.writerows(books)
-        logging.info(f"Saved to {filename}")
-    except Exception as e:
-        logging.error(f"CSV save error: {e}")
-
-# Import CSV to DB
-def import_csv_to_db(csv_file):
+        first, entry = fetch_with_cache(page_url(base_url, 1))
+    except FetchError:
+        first, entry = None, None
+        failed.add(1)
+        count_page("failed")
+    if first is None and not failed:
+        logging.info("Scraping complete. Total books: 0")
+        return
+
+    raw_pages = queue.Queue(maxsize=queue_size)
+    parsed_pages = queue.Queue(maxsize=queue_size)
+    validators = {}
+    digests = {}
+    if first is None:
+        # No pager without page 1: probe until a missing page
+        last_page = None
+    elif entry is not None:
+        last_page = entry.get("page_count")
+        if page_needed(checkpoint, 1):
+            raw_pages.put((1, None, None, entry["books"]))
+    elif not page_needed(checkpoint, 1):
+        last_page = parse_page_count(first.text)
+    else:
+        last_page = parse_page_count(first.text)
+        validators[1] = response_validators(first)
+        digests[1] = content_hash(first.content)
+        raw_pages.put((1, first.content, first.encoding, unchanged_books(page_url(base_url, 1), digests[1])))
+    next_page = [2]
+    failures = [0]
+    stop = threading.Event()
+    lock = threading.Lock()
+    stats = {
+        "fetch": {"workers": fetch_workers, "items": 1, "busy": 0.0,
+                  "bytes": len(first.content) if first is not None else 0, "unit": "pages"},
+        "parse": {"workers": parse_workers, "items": 0, "busy": 0.0, "unit": "pages"},
+        "write": {"workers": 1, "items": 0, "busy": 0.0, "unit": "books"},
+    }
+
+    def fetch_worker():
+        while not stop.is_set():
+            with lock:
+                page = next_page[0]
+                next_page[0] += 1
+            if last_page is not None and page > last_page:
+                break
+            if not page_needed(checkpoint, page):
+                continue
+            start = time.perf_counter()
+            try:
+                response, entry = fetch_with_cache(page_url(base_url, page))
+            except FetchError:
+                count_page("failed")
+                with lock:
+                    failed.add(page)
+                    failures[0] += 1
+                    if last_page is None and failures[0] >= MAX_FAILED_PAGES:
+                        logging.error(f"Stopping after {failures[0]} failed pages in a row")
+                        stop.set()
+                continue
+            if response is None:
+                stop.set()
+                break
+            with lock:
+                failures[0] = 0
+                stats["fetch"]["items"] += 1
+                stats["fetch"]["bytes"] += len(response.content)
+                stats["fetch"]["busy"] += time.perf_counter() - start
+            if entry is not None:
+                raw_pages.put((page, None, None, entry["books"]))
+            else:
+                validators[page] = response_validators(response)
+                digests[page] = content_hash(response.content)
+                books = unchanged_books(page_url(base_url, page), digests[page])
+                raw_pages.put((page, response.content, response.encoding, books))
+
+    def write_worker():
+        while True:
+            item = parsed_pages.get()
+            if item is None:
+                break
+            page, books, complete = item
+            start = time.perf_counter()
+            if books is not None:
+                get_writer().add(books, page_url(base_url, page), digests.pop(page, None))
+                stats["write"]["items"] += len(books)
+            if complete:
+                get_writer().complete_page(page)
+            stats["write"]["busy"] += time.perf_counter() - start
+
+    # Spawned, not forked: a fork while a fetch thread holds a lock (metrics, logging) deadlocks the child
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+    pool = ProcessPoolExecutor(max_workers=parse_workers, mp_context=multiprocessing.get_context("spawn"))
+
+    fetchers = [threading.Thread(target=fetch_worker, daemon=True) for _ in range(fetch_workers)]
+    for thread in fetchers:
+        thread.start()
+    write_thread = threading.Thread(target=write_worker, daemon=True)
+    write_thread.start()
+
+    results = {}
+    pending = {}
+    next_page_out = 1
+    finished = False
+    total = 0
+
+    # Yield parsed pages in order, skipping failed ones; stop at the first missing or empty page, like the sequential crawl
+    def ready():
+        nonlocal next_page_out, finished, total
+        while not finished:
+            if not page_needed(checkpoint, next_page_out) or next_page_out in failed:
+                next_page_out += 1
+                continue
+            if next_page_out not in results:
+                break
+            books = results.pop(next_page_out)
+            if not books:
+                finished = True
+                break
+            total += len(books)
+            yield from books
+            next_page_out += 1
+
+    def collect(done):
+        for future in done:
+            page = pending.pop(future)
+            books, elapsed = future.result()
+            results[page] = books
+            stats["parse"]["items"] += 1
+            stats["parse"]["busy"] += elapsed
+            metrics.observe("parse_seconds", elapsed)
+            count_page("processed")
+            if cache is not None:
+                # Before queueing: the writer pops the digest
+                page_count = last_page if page == 1 else None
+                cache.store(page_url(base_url, page), validators.pop(page, None), books, page_count, digests.get(page))
+            parsed_pages.put((page, books, bool(books)))
+
+    with pool:
+        while True:
+            try:
+                page, content, encoding, cached_books = raw_pages.get(timeout=0.1)
+            except queue.Empty:
+                collect([future for future in pending if future.done()])
+                yield from ready()
+                if not any(thread.is_alive() for thread in fetchers) and raw_pages.empty():
+                    break
+                continue
+            if cached_books is not None:
+                if cache is not None and page in validators:
+                    cache.store(page_url(base_url, page), validators.pop(page), cached_books,
+                                last_page if page == 1 else None, digests.get(page))
+                results[page] = cached_books
+                # Already stored: the writer only marks the page done, keeping its stored hash and books
+                digests.pop(page, None)
+                parsed_pages.put((page, None, bool(cached_books)))
+                yield from ready()
+                continue
+            if len(pending) >= parse_workers * 2:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                collect(done)
+                yield from ready()
+            pending[pool.submit(parse_page, content, encoding, parser_name)] = page
+        collect(wait(pending)[0])
+        yield from ready()
+
+    parsed_pages.put(None)
+    write_thread.join()
+    start = time.perf_counter()
+    get_writer().flush()
+    stats["write"]["busy"] += time.perf_counter() - start
+
+    elapsed = time.perf_counter() - started
+    log_stage_stats(stats, elapsed)
+    logging.info(f"Downloaded {stats['fetch']['bytes'] / 1e6:.1f} MB in {elapsed:.2f}s")
+    logging.info(f"Scraping complete. Total books: {total}")
+
+# Tree builder for detail crawling: lxml when installed, else the stdlib parser
+BS4_FEATURES = "lxml" if HAVE_LXML else "html.parser"
+
+# Detail-page links and the next listing page from a catalogue page
+def parse_listing_links(html, url):
+    from bs4 import BeautifulSoup
+    soup = BeautifulSoup(html, BS4_FEATURES)
+    links = [urljoin(url, a["href"]) for a in soup.select("article.product_pod h3 a[href]")]
+    next_link = soup.select_one("li.next a[href]")
+    return links, urljoin(url, next_link["href"]) if next_link else None
+
+# Full record from a book's detail page
+def parse_book_detail(html, url):
+    from bs4 import BeautifulSoup
+    soup = BeautifulSoup(html, BS4_FEATURES)
+    main = soup.select_one("div.product_main")
+    book = make_book(main.h1.text.strip(), main.select_one("p.price_color").text).to_dict()
+
+    table = {row.th.text.strip(): row.td.text.strip() for row in soup.select("table tr") if row.th and row.td}
+    stock = re.search(r"(\d+) available", table.get("Availability", ""))
+    rating = main.select_one("p.star-rating")
+    crumbs = soup.select("ul.breadcrumb li a")
+    description = soup.select_one("#product_description + p")
+    book.update({
+        "upc": table.get("UPC"),
+        "stock": int(stock.group(1)) if stock else 0,
+        "category": crumbs[-1].text.strip() if len(crumbs) > 2 else None,
+        "rating": next((RATINGS[c] for c in rating.get("class", []) if c in RATINGS), None) if rating else None,
+        "description": description.text.strip() if description else None,
+        "url": url,
+    })
+    return book
+
+# URL frontier: lowest depth first, every URL scheduled at most once
+class Frontier:
+    def __init__(self):
+        self.heap = []
+        self.seen = set()
+        self.counter = itertools.count()
+
+    def push(self, url, depth, kind):
+        if url in self.seen:
+            return
+        self.seen.add(url)
+        heapq.heappush(self.heap, (depth, next(self.counter), url, kind))
+
+    def pop(self):
+        depth, _, url, kind = heapq.heappop(self.heap)
+        return url, depth, kind
+
+    def __len__(self):
+        return len(self.heap)
+
+# Fetch and parse one frontier URL (runs inside worker threads)
+def crawl_url(url, kind):
     try:
-        with sqlite3.connect(DATABASE) as con, open(csv_file, "r", encoding="utf-8") as f:
-            cur = con.cursor()
-            reader = csv.DictReader(f)
-            for row in reader:
-                cur.execute(
-                    "INSERT INTO books (title, currency, price) VALUES (?, ?, ?)",
-                    (row["title"], row["currency"], float(row["price"]))
-                )
-        logging.info(f"Imported CSV: {csv_file}")
+        html = fetch_page(url)
+    except FetchError:
+        html = None
+    if html is None:
+        return ([], None) if kind == "listing" else None
+    start = time.perf_counter()
+    try:
+        if kind == "listing":
+            return parse_listing_links(html, url)
+        return parse_book_detail(html, url)
     except Exception as e:
-        logging.error(f"CSV import error: {e}")
-
-# Display books
-def display_books():
+        logging.warning(f"Error parsing {url}: {e}")
+        return ([], None) if kind == "listing" else None
+    finally:
+        metrics.observe("parse_seconds", time.perf_counter() - start)
+
+# Crawl several site profiles at once into the shared writer
+def crawl_profiles(profiles, concurrency=1):
+    def crawl(profile):
+        try:
+            return sum(1 for _ in scrape_all_pages(profile.base_url, concurrency, None, profile))
+        except Exception as e:
+            logging.error(f"Profile {profile.name} error: {e}")
+            return 0
+
+    with ThreadPoolExecutor(max_workers=len(profiles)) as pool:
+        totals = dict(zip([profile.name for profile in profiles], pool.map(crawl, profiles)))
+    for name, total in totals.items():
+        logging.info(f"Profile {name}: {total} books")
+    return totals
+
+# Crawl listing pages and every book's detail page, yielding full records
+def crawl_details(base_url, concurrency=8):
+    frontier = Frontier()
+    frontier.push(page_url(base_url, 1), 0, "listing")
+    pending = {}
+    total = 0
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        while frontier or pending:
+            while frontier and len(pending) < concurrency * 2:
+                url, depth, kind = frontier.pop()
+                pending[pool.submit(crawl_url, url, kind)] = (url, depth, kind)
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                url, depth, kind = pending.pop(future)
+                result = future.result()
+                if kind == "listing":
+                    links, next_url = result
+                    for link in links:
+                        frontier.push(link, depth + 1, "detail")
+                    if next_url:
+                        frontier.push(next_url, depth + 1, "listing")
+                    logging.debug(f"Found {len(links)} books on {url}")
+                elif result is not None:
+                    get_writer().add_details([result])
+                    total += 1
+                    yield result
+
+    get_writer().flush()
+    logging.info(f"Detail crawl complete. {len(frontier.seen)} URLs seen, total books: {total}")
+
+# Connection for the shared work queue: several processes (or hosts) use the file, so wait on locks
+def queue_connection():
+    con = sqlite3.connect(DATABASE, timeout=30, isolation_level=None)
+    con.execute("PRAGMA journal_mode=WAL")
+    con.execute("PRAGMA synchronous=NORMAL")
+    return con
+
+# Queue a crawl of base_url as page-range shards; returns the run id
+def plan_shards(base_url, shard_size=10):
+    import uuid
     try:
-        with sqlite3.connect(DATABASE) as con:
-            cur = con.cursor()
-            cur.execute("SELECT * FROM books")
-            rows = cur.fetchall()
-            headers = [description[0] for description in cur.description]
-            if rows:
-                print("\n📚 Books in Database:\n")
-                print(tabulate(rows, headers=headers, tablefmt="fancy_grid"))
-            else:
-                logging.info("Database is empty.")
+        last_page = fetch_page_count(page_url(base_url, 1))
+    except FetchError as e:
+        logging.error(f"Cannot plan shards: {e}")
+        return None
+    if last_page is None:
+        logging.error(f"No pager on {base_url}: a sharded crawl needs the page count")
+        return None
+    run_id = uuid.uuid4().hex[:12]
+    shards = [(run_id, base_url, first, min(first + shard_size - 1, last_page))
+              for first in range(1, last_page + 1, shard_size)]
+    con = queue_connection()
+    try:
+        with con:
+            con.execute("BEGIN IMMEDIATE")
+            con.executemany("""
+                INSERT INTO work_queue (run_id, base_url, first_page, last_page, status, updated_at)
+                VALUES (?, ?, ?, ?, 'pending', CURRENT_TIMESTAMP)
+            """, shards)
+    finally:
+        con.close()
+    logging.info(f"Queued run {run_id}: {last_page} pages in {len(shards)} shards of {shard_size}")
+    return run_id
+
+# Lease the next shard, reclaiming expired leases; None when nothing is leasable right now
+def lease_shard(con, worker, lease_timeout=LEASE_TIMEOUT):
+    now = time.time()
+    with con:
+        con.execute("BEGIN IMMEDIATE")
+        failed = con.execute(FAIL_EXPIRED_SHARDS, (now, MAX_LEASE_ATTEMPTS)).rowcount
+        rows = con.execute(LEASE_SHARD, (worker, now + lease_timeout, now)).fetchall()
+    if failed:
+        logging.warning(f"Gave up on {failed} shards after {MAX_LEASE_ATTEMPTS} expired leases")
+    return rows[0] if rows else None
+
+# Extend a lease while the shard is still being crawled
+def renew_lease(con, shard_id, worker, lease_timeout=LEASE_TIMEOUT):
+    con.execute(
+        "UPDATE work_queue SET lease_expires = ? WHERE id = ? AND worker = ? AND status = 'leased'",
+        (time.time() + lease_timeout, shard_id, worker),
+    )
+
+# Renew a shard's lease every third of the timeout until stopped, so one slow page cannot let it expire
+def lease_heartbeat(shard_id, worker, lease_timeout, stop):
+    con = queue_connection()
+    try:
+        while not stop.wait(lease_timeout / 3):
+            renew_lease(con, shard_id, worker, lease_timeout)
     except sqlite3.Error as e:
-        logging.error(f"Display error: {e}")
+        logging.warning(f"Worker {worker} lease renewal error: {e}")
+    finally:
+        con.close()
 
-# CLI Arguments
-def parse_args():
-    parser = argparse.ArgumentParser(description="Books Scraper CLI")
-    parser.add_argument("--scrape", action="store_true", help="Scrape all books")
-    parser.add_argument("--display", action="store_true", help="Display all books")
-    parser.add_argument("--export", action="store_true", help="Export books to JSON and CSV")
-    return parser.parse_args()
-
-# Main execution
-def main():
-    create_table()
-    args = parse_args()
-
-    if args.scrape:
-        books = scrape_all_pages(URL)
-        if args.export:
-            save_to_json(books)
-            save_to_csv(books)
-
-    if args.display:
-        display_books()
-
-if __name__ == "__main__":
-    main()
-import requests
-import sqlite3
-import json
-import csv
-import logging
-import argparse
-from bs4 import BeautifulSoup
-from tabulate import tabulate
-
-# Configuration
-DATABASE = "books.sqlite3"
-JSON_FILE = "books.json"
-CSV_FILE = "books.csv"
-URL = "http://books.toscrape.com/"
-
-# Logging setup
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler("books_scraper.log"),
-        logging.StreamHandler()
-    ]
-)
-
-# Create table
-def create_table():
-    with sqlite3.connect(DATABASE) as con:
-        cur = con.cursor()
-        cur.execute("""
-            CREATE TABLE IF NOT EXISTS books(
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                title TEXT NOT NULL,
-                currency TEXT NOT NULL,
-                price REAL NOT NULL
-            );
-        """)
-    logging.info("Database table ready.")
-
-# Insert book with duplicate check
-def insert_book(title, currency, price):
+# Fetch and parse one page without the shared writer (sharded workers stage their own rows)
+def fetch_books(url):
     try:
-        with sqlite3.connect(DATABASE) as con:
-            cur = con.cursor()
-            cur.execute("SELECT id FROM books WHERE title = ? AND price = ?", (title, price))
-            if not cur.fetchone():
-                cur.execute(
-                    "INSERT INTO books (title, currency, price) VALUES (?, ?, ?)",
-                    (title, currency, price)
-                )
-                logging.info(f"Inserted: {title}")
-            else:
-                logging.info(f"Skipped duplicate: {title}")
+        html = fetch_page(url)
+    except FetchError:
+        return None
+    return None if html is None else parse_books(html)
+
+# Lease shards and crawl them into this worker's staging table until the queue is drained
+def run_worker(worker=None, concurrency=1, lease_timeout=LEASE_TIMEOUT):
+    import uuid
+    worker = worker or uuid.uuid4().hex[:12]
+    staging = f"staging_{worker}"
+    con = queue_connection()
+    con.execute(f"""
+        CREATE TABLE IF NOT EXISTS {staging}(
+            source TEXT NOT NULL,
+            title TEXT NOT NULL,
+            currency TEXT NOT NULL,
+            price REAL NOT NULL
+        )
+    """)
+    shards = rows = 0
+    try:
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            while True:
+                shard = lease_shard(con, worker, lease_timeout)
+                if shard is None:
+                    # Nothing leasable: wait while other workers still hold leases, which may expire
+                    if con.execute("SELECT COUNT(*) FROM work_queue WHERE status = 'leased'").fetchone()[0] == 0:
+                        break
+                    time.sleep(1.0)
+                    continue
+
+                shard_id, base_url, first_page, last_page, attempt = shard
+                logging.debug(f"Worker {worker} leased pages {first_page}-{last_page} (attempt {attempt})")
+                books = []
+                complete = True
+                urls = [page_url(base_url, page) for page in range(first_page, last_page + 1)]
+                stop = threading.Event()
+                heartbeat = threading.Thread(target=lease_heartbeat, args=(shard_id, worker, lease_timeout, stop), daemon=True)
+                heartbeat.start()
+                try:
+                    for page_books in pool.map(fetch_books, urls):
+                        if page_books is None:
+                            complete = False
+                        else:
+                            books.extend(page_books)
+                finally:
+                    stop.set()
+                    heartbeat.join()
+
+                # Staged rows and the shard's new state commit together
+                with con:
+                    con.execute("BEGIN IMMEDIATE")
+                    con.executemany(
+                        f"INSERT INTO {staging} (source, title, currency, price) VALUES (?, ?, ?, ?)",
+                        ((book.source, book.title, book.currency, book.price) for book in books),
+                    )
+                    con.execute("""
+                        UPDATE work_queue SET
+                            status = CASE WHEN ? THEN 'done' WHEN attempts >= ? THEN 'failed' ELSE 'pending' END,
+                            worker = NULL, lease_expires = NULL, updated_at = CURRENT_TIMESTAMP
+                        WHERE id = ? AND worker = ?
+                    """, (complete, MAX_LEASE_ATTEMPTS, shard_id, worker))
+                shards += 1
+                rows += len(books)
     except sqlite3.Error as e:
-        logging.error(f"Insert error: {e}")
-
-# Scrape single page
-def scrape_books(url):
+        logging.error(f"Worker {worker} error: {e}")
+    finally:
+        con.close()
+    logging.info(f"Worker {worker}: {shards} shards, {rows} books staged")
+    return shards
+
+# Entry point of a worker process started by the coordinator
+def worker_process(fetch_options, parser, concurrency, lease_timeout, verbose=False):
+    setup_logging(verbose)
+    configure_fetcher(**fetch_options)
+    configure_parser(parser)
+    run_worker(concurrency=concurrency, lease_timeout=lease_timeout)
+
+# Merge every staging table into books once the queue is drained, then drop them
+def merge_staging(run_id=None):
+    con = queue_connection()
     try:
-        response = requests.get(url)
-        response.raise_for_status()
-    except requests.RequestException as e:
-        logging.error(f"Request error: {e}")
-        return []
-
-    books = []
-    soup = BeautifulSoup(response.text, "html.parser")
-    book_elements = soup.find_all("article", class_="product_pod")
-
-    for book in book_elements:
+        remaining = con.execute("SELECT COUNT(*) FROM work_queue WHERE status IN ('pending', 'leased')").fetchone()[0]
+        if remaining:
+            logging.warning(f"{remaining} shards still pending or leased, not merging yet")
+            return None
+        tables = [row[0] for row in con.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table' AND name LIKE 'staging\\_%' ESCAPE '\\'"
+        )]
+        staged = written = 0
+        with con:
+            con.execute("BEGIN IMMEDIATE")
+            for table in tables:
+                staged += con.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+                written += con.execute(MERGE_STAGING.format(table=table)).rowcount
+                con.execute(f"DROP TABLE {table}")
+            con.execute(RECORD_ALL_PRICES, (run_id,))
+    except sqlite3.Error as e:
+        logging.error(f"Merge error: {e}")
+        return None
+    finally:
+        con.close()
+    logging.info(f"Merged {len(tables)} staging tables: {staged} rows, {written} books written")
+    return written
+
+# Queue a sharded crawl, run local worker processes and merge their results
+def coordinate(base_url, workers, fetch_options, parser, concurrency=1, shard_size=10,
+               lease_timeout=LEASE_TIMEOUT, verbose=False):
+    import multiprocessing
+    run_id = plan_shards(base_url, shard_size)
+    if run_id is None or not workers:
+        return run_id
+    # spawn, not fork: workers must not share the coordinator's pooled sockets
+    context = multiprocessing.get_context("spawn")
+    processes = [
+        context.Process(target=worker_process, args=(fetch_options, parser, concurrency, lease_timeout, verbose))
+        for _ in range(workers)
+    ]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+    con = queue_connection()
+    try:
+        counts = dict(con.execute("SELECT status, COUNT(*) FROM work_queue WHERE run_id = ? GROUP BY status", (run_id,)))
+    finally:
+        con.close()
+    logging.info(f"Run {run_id}: {counts.get('done', 0)} shards done, {counts.get('failed', 0)} failed")
+    merge_staging(run_id)
+    return run_id
+
+# Per-page revisit intervals: a change resets a page to the base interval, every unchanged check doubles it
+class RefreshSchedule:
+    def __init__(self, interval=3600.0, max_interval=None):
+        self.interval = interval
+        self.max_interval = max_interval or interval * 16
+        self.pages = {}
+
+    # Track pages 1..last_page (new pages are due at once) and forget pages past the end
+    def resize(self, last_page, now):
+        for page in range(1, last_page + 1):
+            if page not in self.pages:
+                self.pages[page] = {"interval": self.interval, "due": now, "checks": 0, "changes": 0, "changed_at": None}
+        for page in [page for page in self.pages if page > last_page]:
+            del self.pages[page]
+
+    # Pages due now, those that change most often and most recently first
+    def due(self, now):
+        return sorted((page for page, state in self.pages.items() if state["due"] <= now), key=self.priority, reverse=True)
+
+    def priority(self, page):
+        state = self.pages[page]
+        rate = state["changes"] / state["checks"] if state["checks"] else 1.0
+        return rate, state["changed_at"] or 0.0
+
+    def record(self, page, status, now):
+        state = self.pages.get(page)
+        if state is None:
+            return
+        if status == "failed":
+            # Not a real check: try again after the base interval
+            state["due"] = now + self.interval
+            return
+        state["checks"] += 1
+        if status == "processed":
+            state["changes"] += 1
+            state["changed_at"] = now
+            state["interval"] = self.interval
+        else:
+            state["interval"] = min(state["interval"] * 2, self.max_interval)
+        state["due"] = now + state["interval"]
+
+    def next_due(self):
+        return min((state["due"] for state in self.pages.values()), default=None)
+
+    def summary(self, now):
+        return {
+            "tracked": len(self.pages),
+            "due": sum(1 for state in self.pages.values() if state["due"] <= now),
+            "held_back": sum(1 for state in self.pages.values() if state["interval"] > self.interval),
+            "at_max_interval": sum(1 for state in self.pages.values() if state["interval"] >= self.max_interval),
+        }
+
+# Long-running refresher: warm HTTP pool and DB connection, pages revisited on their own schedule
+class Daemon:
+    def __init__(self, base_url, interval=3600.0, max_interval=None, concurrency=4):
+        self.base_url = base_url
+        self.schedule = RefreshSchedule(interval, max_interval)
+        self.pool = ThreadPoolExecutor(max_workers=concurrency)
+        self.stop = threading.Event()
+        self.lock = threading.Lock()
+        self.started = time.time()
+        self.cycles = 0
+        self.last_cycle = None
+        self.last_metrics = None
+        self.next_cycle = None
+
+    def load(self, page):
+        return load_page_status(page_url(self.base_url, page))
+
+    # Refresh page 1 (for the pager) and every page that is due
+    def cycle(self):
+        reset_metrics()
+        page_stats.clear()
+        get_fetcher().reset_stats()
+        written = get_writer().written
+        now = time.time()
+        started = time.perf_counter()
+
+        _, last_page, status = self.load(1)
+        if last_page is not None:
+            self.schedule.resize(last_page, now)
+        elif not self.schedule.pages:
+            logging.warning(f"No page count for {self.base_url}, refreshing page 1 only")
+        self.schedule.record(1, status, now)
+        statuses = Counter([status])
+        due = [page for page in self.schedule.due(now) if page != 1]
+        for page, (_, _, status) in zip(due, self.pool.map(self.load, due)):
+            self.schedule.record(page, status, now)
+            statuses[status] += 1
+        get_writer().flush()
+
+        elapsed = time.perf_counter() - started
+        with self.lock:
+            self.cycles += 1
+            self.last_metrics = metrics
+            self.last_cycle = {
+                "finished_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+                "seconds": elapsed,
+                "pages_checked": sum(statuses.values()),
+                "pages_changed": statuses["processed"],
+                "pages_unchanged": statuses["unchanged"] + statuses["not_modified"],
+                "pages_failed": statuses["failed"],
+                "books_written": get_writer().written - written,
+            }
+        logging.info(
+            f"Refresh cycle {self.cycles}: {sum(statuses.values())} pages checked, {statuses['processed']} changed, "
+            f"{statuses['failed']} failed, {len(self.schedule.pages) - sum(statuses.values())} held back "
+            f"in {elapsed:.2f}s"
+        )
+
+    # Cycle until stopped, sleeping until the next page is due (at most the base interval)
+    def run(self, status_port=None):
+        server = self.serve(status_port) if status_port is not None else None
         try:
-            title = book.h3.a['title']
-            price_text = book.find("p", class_="price_color").text
-            currency = price_text[0]
-            price = float(price_text[1:])
-
-            books.append({"title": title, "currency": currency, "price": price})
-            insert_book(title, currency, price)
-        except Exception as e:
-            logging.warning(f"Error parsing book: {e}")
-
-    logging.info(f"Scraped {len(books)} books from {url}")
-    return books
-
-# Scrape all pages
-def scrape_all_pages(base_url):
-    page = 1
-    all_books = []
-    while True:
-        page_url = f"{base_url}catalogue/page-{page}.html"
-        books = scrape_books(page_url)
-        if not books:
-            break
-        all_books.extend(books)
-        page += 1
-    logging.info(f"Scraping complete. Total books: {len(all_books)}")
-    return all_books
+            while not self.stop.is_set():
+                try:
+                    self.cycle()
+                except Exception as e:
+                    logging.error(f"Refresh cycle error: {e}")
+                next_due = self.schedule.next_due()
+                wait = self.schedule.interval if next_due is None else next_due - time.time()
+                wait = max(1.0, min(wait, self.schedule.interval))
+                self.next_cycle = time.time() + wait
+                self.stop.wait(wait)
+        finally:
+            if server is not None:
+                server.shutdown()
+            self.pool.shutdown()
+        logging.info(f"Daemon stopped after {self.cycles} refresh cycles")
+
+    def status(self):
+        now = time.time()
+        with self.lock:
+            return {
+                "base_url": self.base_url,
+                "started_at": datetime.fromtimestamp(self.started, timezone.utc).isoformat(timespec="seconds"),
+                "uptime_seconds": now - self.started,
+                "cycles": self.cycles,
+                "last_cycle": self.last_cycle,
+                "next_cycle_at": datetime.fromtimestamp(self.next_cycle, timezone.utc).isoformat(timespec="seconds")
+                if self.next_cycle else None,
+                "pages": self.schedule.summary(now),
+                "http": get_fetcher().stats(),
+            }
+
+    # Last cycle's metrics plus daemon gauges, in Prometheus text format
+    def prometheus(self):
+        status = self.status()
+        lines = [self.last_metrics.to_prometheus()] if self.last_metrics is not None else []
+        gauges = {
+            "daemon_cycles_total": status["cycles"],
+            "daemon_uptime_seconds": status["uptime_seconds"],
+            "daemon_pages_tracked": status["pages"]["tracked"],
+            "daemon_pages_held_back": status["pages"]["held_back"],
+        }
+        for key in ("seconds", "pages_checked", "pages_changed", "pages_failed", "books_written"):
+            if status["last_cycle"] is not None:
+                gauges[f"daemon_last_cycle_{key}"] = status["last_cycle"][key]
+        for name, value in gauges.items():
+            lines.append(f"# TYPE {METRICS_PREFIX}_{name} {'counter' if name.endswith('_total') else 'gauge'}")
+            lines.append(f"{METRICS_PREFIX}_{name} {value}")
+        return "\n".join(line.rstrip("\n") for line in lines) + "\n"
+
+    # Local HTTP endpoint: /status (JSON) and /metrics (Prometheus)
+    def serve(self, port):
+        from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+        daemon = self
+
+        class StatusHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path == "/status":
+                    body, content_type = json.dumps(daemon.status(), indent=2), "application/json"
+                elif self.path == "/metrics":
+                    body, content_type = daemon.prometheus(), "text/plain; version=0.0.4"
+                else:
+                    self.send_error(404)
+                    return
+                data = body.encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                logging.debug(f"Status endpoint: {format % args}")
+
+        server = ThreadingHTTPServer(("127.0.0.1", port), StatusHandler)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        logging.info(f"Status endpoint on http://127.0.0.1:{server.server_address[1]}/status and /metrics")
+        return server
+
+# Streaming JSON writer: a JSON array (or JSON Lines) written one record at a time
+class JsonSink:
+    def __init__(self, filename=JSON_FILE, lines=False):
+        self.filename = filename
+        self.lines = lines
+        self.count = 0
+        self.file = open(filename, "w", encoding="utf-8")
+        if not lines:
+            self.file.write("[")
+
+    def write(self, book):
+        record = json.dumps(book, ensure_ascii=False, default=book_json)
+        if self.lines:
+            self.file.write(record + "\n")
+        else:
+            self.file.write(("," if self.count else "") + "\n    " + record)
+        self.count += 1
+
+    def close(self):
+        if not self.lines:
+            self.file.write("\n]\n" if self.count else "]\n")
+        self.file.close()
+        logging.info(f"Saved to {self.filename}")
+
+# Streaming CSV writer
+class CsvSink:
+    def __init__(self, filename=CSV_FILE, fields=FIELDS):
+        self.filename = filename
+        self.file = open(filename, "w", newline="", encoding="utf-8")
+        self.fields = fields
+        self.writer = csv.writer(self.file)
+        self.writer.writerow(fields)
+
+    def write(self, book):
+        self.writer.writerow([book.get(field) for field in self.fields])
+
+    def close(self):
+        self.file.close()
+        logging.info(f"Saved to {self.filename}")
+
+# Import pyarrow the first time a columnar format is written; None when not installed
+def load_pyarrow():
+    global pa, pq
+    if pa is None:
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError:
+            return None
+        pa, pq = pyarrow, pyarrow.parquet
+    return pa
+
+# Arrow schema for exported records, with currency dictionary-encoded
+def arrow_schema(fields):
+    types = {
+        "title": pa.string(),
+        "currency": pa.dictionary(pa.int8(), pa.string()),
+        "price": pa.float64(),
+        "upc": pa.string(),
+        "stock": pa.int32(),
+        "category": pa.dictionary(pa.int32(), pa.string()),
+        "rating": pa.int8(),
+        "description": pa.string(),
+        "url": pa.string(),
+        "source": pa.dictionary(pa.int32(), pa.string()),
+    }
+    return pa.schema([(field, types[field]) for field in fields])
+
+# Columnar writer base: buffers records and hands them over one record batch at a time
+class ArrowBatchSink:
+    def __init__(self, filename, fields=FIELDS, batch_size=65536):
+        if load_pyarrow() is None:
+            raise RuntimeError(f"pyarrow is required to write {filename}")
+        self.filename = filename
+        self.fields = fields
+        self.schema = arrow_schema(fields)
+        self.batch_size = batch_size
+        self.columns = {field: [] for field in fields}
+        self.rows = 0
+
+    def write(self, book):
+        for field in self.fields:
+            self.columns[field].append(book.get(field))
+        self.rows += 1
+        if self.rows >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if not self.rows:
+            return
+        batch = pa.RecordBatch.from_pydict(self.columns, schema=self.schema)
+        self.write_batch(batch)
+        self.columns = {field: [] for field in self.fields}
+        self.rows = 0
+
+    def close(self):
+        self.flush()
+        self.close_file()
+        logging.info(f"Saved to {self.filename}")
+
+# Arrow IPC file writer, zstd-compressed
+class ArrowSink(ArrowBatchSink):
+    def __init__(self, filename=ARROW_FILE, fields=FIELDS, batch_size=65536):
+        super().__init__(filename, fields, batch_size)
+        options = pa.ipc.IpcWriteOptions(compression="zstd")
+        self.writer = pa.ipc.new_file(filename, self.schema, options=options)
+
+    def write_batch(self, batch):
+        self.writer.write_batch(batch)
+
+    def close_file(self):
+        self.writer.close()
+
+# Parquet writer, one row group per batch, zstd-compressed
+class ParquetSink(ArrowBatchSink):
+    def __init__(self, filename=PARQUET_FILE, fields=FIELDS, batch_size=65536):
+        super().__init__(filename, fields, batch_size)
+        self.writer = pq.ParquetWriter(filename, self.schema, compression="zstd")
+
+    def write_batch(self, batch):
+        self.writer.write_table(pa.Table.from_batches([batch]), row_group_size=self.batch_size)
+
+    def close_file(self):
+        self.writer.close()
+
+# Sinks for the requested export formats
+def make_sinks(formats, json_lines=False, fields=FIELDS):
+    sinks = []
+    try:
+        for export_format in formats:
+            if export_format == "json":
+                sinks.append(JsonSink(JSONL_FILE if json_lines else JSON_FILE, json_lines))
+            elif export_format == "csv":
+                sinks.append(CsvSink(fields=fields))
+            elif export_format == "arrow":
+                sinks.append(ArrowSink(fields=fields))
+            elif export_format == "parquet":
+                sinks.append(ParquetSink(fields=fields))
+    except Exception:
+        # Don't leak the files already opened
+        for sink in sinks:
+            sink.close()
+        raise
+    return sinks
+
+# Feed one record stream through every sink in a single pass
+def export_stream(books, sinks):
+    count = 0
+    try:
+        for book in books:
+            for sink in sinks:
+                sink.write(book)
+            count += 1
+    finally:
+        for sink in sinks:
+            sink.close()
+    return count
 
 # Save JSON
-def save_to_json(books, filename=JSON_FILE):
+def save_to_json(books, filename=JSON_FILE, lines=False):
     try:
-        with open(filename, "w", encoding="utf-8") as f:
-            json.dump(books, f, ensure_ascii=False, indent=4)
-        logging.info(f"Saved to {filename}")
+        export_stream(books, [JsonSink(filename, lines)])
     except Exception as e:
         logging.error(f"JSON save error: {e}")
 
 # Save CSV
 def save_to_csv(books, filename=CSV_FILE):
     try:
-        with open(filename, "w", newline="", encoding="utf-8") as f:
-            writer = csv.DictWriter(f, fieldnames=["title", "currency", "price"])
-            writer.writeheader()
-            writer.writerows(books)
-        logging.info(f"Saved to {filename}")
+        export_stream(books, [CsvSink(filename)])
     except Exception as e:
         logging.error(f"CSV save error: {e}")
 
-# Import CSV to DB
-def import_csv_to_db(csv_file):
-    try:
-        with sqlite3.connect(DATABASE) as con, open(csv_file, "r", encoding="utf-8") as f:
-            cur = con.cursor()
+# End of a malformed JSON array element: the next ',' or ']' outside strings and nested brackets (None if not buffered yet)
+def json_element_end(buffer, pos):
+    depth = 0
+    in_string = escaped = False
+    for i in range(pos, len(buffer)):
+        char = buffer[i]
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char in "[{":
+            depth += 1
+        elif char in "}]" and depth:
+            depth -= 1
+        elif char in ",]" and not depth:
+            return i
+    return None
+
+# Elements of a JSON array decoded one at a time from buffered reads; a malformed element is yielded
+# as its raw text, so it is rejected like a bad JSON Lines row instead of aborting the import
+def iter_json_array(f, read_size=64 * 1024):
+    decoder = json.JSONDecoder()
+    buffer, pos, eof = "", 0, False
+    state = "start"
+    while True:
+        while pos < len(buffer) and buffer[pos].isspace():
+            pos += 1
+        if pos == len(buffer):
+            if eof:
+                if state == "start":
+                    raise ValueError("not a JSON array")
+                if state != "done":
+                    logging.warning("JSON array ends without ']', file may be truncated")
+                return
+            chunk = f.read(read_size)
+            buffer, pos, eof = buffer[pos:] + chunk, 0, not chunk
+            continue
+        if state == "start":
+            if buffer[pos] != "[":
+                raise ValueError("not a JSON array")
+            pos += 1
+            state = "first"
+        elif state == "done":
+            return
+        elif state == "separator":
+            # Always ',' or ']': values are only accepted when one follows
+            state = "done" if buffer[pos] == "]" else "value"
+            pos += state == "value"
+        elif state == "first" and buffer[pos] == "]":
+            state = "done"
+        else:
+            complete = False
+            try:
+                record, end = decoder.raw_decode(buffer, pos)
+                # A value is complete once a separator follows: "12" may be the start of "12.5"
+                following = JSON_SEPARATOR_RE.match(buffer, end)
+                complete = following.group(1) in ",]" if following else eof
+            except ValueError:
+                pass
+            if not complete:
+                # Possibly cut off by the read: buffer more, up to one record's worth
+                if not eof and len(buffer) - pos < MAX_JSON_RECORD:
+                    chunk = f.read(read_size)
+                    buffer, pos, eof = buffer[pos:] + chunk, 0, not chunk
+                    continue
+                end = json_element_end(buffer, pos)
+                while end is None and not eof:
+                    chunk = f.read(read_size)
+                    buffer, eof = buffer + chunk, not chunk
+                    end = json_element_end(buffer, pos)
+                if end is None:
+                    end = len(buffer)
+                record = buffer[pos:end].strip()
+            yield record
+            pos = end
+            state = "separator"
+
+# Records from a CSV, JSON Lines or JSON array file as (line number, record)
+def read_import_rows(path):
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        if path.endswith(".csv"):
             reader = csv.DictReader(f)
             for row in reader:
-                cur.execute(
-                    "INSERT INTO books (title, currency, price) VALUES (?, ?, ?)",
-                    (row["title"], row["currency"], float(row["price"]))
-                )
-        logging.info(f"Imported CSV: {csv_file}")
-    except Exception as e:
-        logging.error(f"CSV import error: {e}")
-
-# Display books
-def display_books():
+                yield reader.line_num, row
+        elif path.endswith(".json"):
+            for index, record in enumerate(iter_json_array(f), 1):
+                yield index, record
+        else:
+            for line_no, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                try:
+                    yield line_no, json.loads(line)
+                except ValueError:
+                    yield line_no, line.rstrip("\n")
+
+# Validate an imported record into a (title, currency, price) row
+def import_row(record):
+    if not isinstance(record, dict):
+        raise ValueError("not a JSON object")
+    title = record["title"].strip()
+    currency = record["currency"].strip()
+    price = float(record["price"])
+    if not title or not currency:
+        raise ValueError("empty title or currency")
+    return str(record.get("source") or "").strip(), title, currency, price
+
+# Drop secondary indexes and FTS triggers; rebuilding them once is cheaper than per-row upkeep
+def drop_bulk_indexes(con):
+    for trigger in ("books_fts_insert", "books_fts_delete", "books_fts_update"):
+        con.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+    con.execute("DROP INDEX IF EXISTS idx_books_price")
+    con.execute("DROP INDEX IF EXISTS idx_books_currency_price")
+
+def restore_bulk_indexes(con):
+    create_query_indexes(con)
     try:
-        with sqlite3.connect(DATABASE) as con:
-            cur = con.cursor()
-            cur.execute("SELECT * FROM books")
-            rows = cur.fetchall()
-            headers = [description[0] for description in cur.description]
-            if rows:
-                print("\n📚 Books in Database:\n")
-                print(tabulate(rows, headers=headers, tablefmt="fancy_grid"))
-            else:
-                logging.info("Database is empty.")
-    except sqlite3.Error as e:
-        logging.error(f"Display error: {e}")
-
-# CLI Arguments
-def parse_args():
-    parser = argparse.ArgumentParser(description="Books Scraper CLI")
-    parser.add_argument("--scrape", action="store_true", help="Scrape all books")
-    parser.add_argument("--display", action="store_true", help="Display all books")
-    parser.add_argument("--export", action="store_true", help="Export books to JSON and CSV")
-    return parser.parse_args()
-
-# Main execution
-def main():
-    create_table()
-    args = parse_args()
-
-    if args.scrape:
-        books = scrape_all_pages(URL)
-        if args.export:
-            save_to_json(books)
-            save_to_csv(books)
-
-    if args.display:
-        display_books()
-
-if __name__ == "__main__":
-    main()
-import requests
-import sqlite3
-import json
-import csv
-import logging
-import argparse
-from bs4 import BeautifulSoup
-from tabulate import tabulate
-
-# Configuration
-DATABASE = "books.sqlite3"
-JSON_FILE = "books.json"
-CSV_FILE = "books.csv"
-URL = "http://books.toscrape.com/"
-
-# Logging setup
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler("books_scraper.log"),
-        logging.StreamHandler()
-    ]
-)
-
-# Create table
-def create_table():
-    with sqlite3.connect(DATABASE) as con:
-        cur = con.cursor()
-        cur.execute("""
-            CREATE TABLE IF NOT EXISTS books(
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                title TEXT NOT NULL,
-                currency TEXT NOT NULL,
-                price REAL NOT NULL
-            );
-        """)
-    logging.info("Database table ready.")
-
-# Insert book with duplicate check
-def insert_book(title, currency, price):
+        create_search_index(con)
+    except sqlite3.OperationalError as e:
+        logging.warning(f"Full-text search unavailable, skipping: {e}")
+
+# Bulk import: chunked executemany upserts, malformed rows quarantined to a reject file
+def import_file(path, chunk_size=50000, reject_file=None):
+    reject_file = reject_file or f"{path}.rejects.jsonl"
+    started = time.perf_counter()
+    total = written = rejected = 0
+    rejects = None
+    bulk = False
+    con = sqlite3.connect(DATABASE)
     try:
-        with sqlite3.connect(DATABASE) as con:
-            cur = con.cursor()
-            cur.execute("SELECT id FROM books WHERE title = ? AND price = ?", (title, price))
-            if not cur.fetchone():
-                cur.execute(
-                    "INSERT INTO books (title, currency, price) VALUES (?, ?, ?)",
-                    (title, currency, price)
-                )
-                logging.info(f"Inserted: {title}")
-            else:
-                logging.info(f"Skipped duplicate: {title}")
-    except sqlite3.Error as e:
-        logging.error(f"Insert error: {e}")
+        # Bulk-load journaling: the import can be rerun, so skip fsyncs
+        con.execute("PRAGMA synchronous=OFF")
+        con.execute("PRAGMA temp_store=MEMORY")
+        con.execute("PRAGMA cache_size=-262144")
+        if os.path.getsize(path) >= BULK_IMPORT_BYTES:
+            bulk = True
+            with con:
+                drop_bulk_indexes(con)
+
+        def flush(chunk):
+            nonlocal written
+            with con:
+                written += con.executemany(UPSERT_BOOK, chunk).rowcount
+
+        chunk = []
+        for line_no, record in read_import_rows(path):
+            total += 1
+            try:
+                chunk.append(import_row(record))
+            except (KeyError, TypeError, ValueError, AttributeError) as e:
+                if rejects is None:
+                    rejects = open(reject_file, "w", encoding="utf-8")
+                rejects.write(json.dumps({"line": line_no, "error": str(e), "record": record}, ensure_ascii=False) + "\n")
+                rejected += 1
+                continue
+            if len(chunk) >= chunk_size:
+                flush(chunk)
+                chunk = []
+        flush(chunk)
+        if written:
+            with con:
+                con.execute(RECORD_ALL_PRICES, (f"import:{os.path.basename(path)}",))
+    except (OSError, ValueError, sqlite3.Error) as e:
+        logging.error(f"Import error: {e}")
+        return None
+    finally:
+        if bulk:
+            logging.info("Rebuilding indexes after bulk import")
+            with con:
+                restore_bulk_indexes(con)
+        con.close()
+        if rejects is not None:
+            rejects.close()
+
+    elapsed = time.perf_counter() - started
+    logging.info(
+        f"Imported {path}: {total} rows, {written} written, {total - written - rejected} unchanged, "
+        f"{rejected} rejected in {elapsed:.2f}s ({total / elapsed if elapsed else 0:.0f} rows/sec)"
+    )
+    if rejected:
+        logging.warning(f"Rejected rows saved to {reject_file}")
+    return {"rows": total, "written": written, "rejected": rejected, "seconds": elapsed}
 
-# Scrape single page
-def scrape_books(url):
+# Import CSV to DB
+def import_csv_to_db(csv_file):
+    return import_file(csv_file)
+
+# Filtered, ordered and paginated SELECT over books; returns (sql, params)
+def build_query(min_price=None, max_price=None, title_prefix=None, title_contains=None, currency=None,
+                source=None, sources=None, order_by="id", descending=False, limit=None, offset=None, after=None,
+                columns=("id", "title", "currency", "price")):
+    if order_by not in ORDER_KEYS:
+        raise ValueError(f"Cannot order by {order_by!r}, choose from {', '.join(ORDER_KEYS)}")
+    where = []
+    params = []
+    if min_price is not None:
+        where.append("price >= ?")
+        params.append(min_price)
+    if max_price is not None:
+        where.append("price <= ?")
+        params.append(max_price)
+    if title_prefix:
+        # Range scan on the title index instead of LIKE
+        where.append("title >= ? AND title < ?")
+        params += [title_prefix, title_prefix[:-1] + chr(ord(title_prefix[-1]) + 1)]
+    if title_contains:
+        where.append("instr(title, ?) > 0")
+        params.append(title_contains)
+    if currency:
+        where.append("currency = ?")
+        params.append(currency)
+    if source is not None:
+        where.append("source = ?")
+        params.append(source)
+    if sources is not None:
+        where.append(f"source IN ({', '.join('?' * len(sources))})")
+        params += sources
+    if after is not None:
+        # Keyset pagination: continue after the last (sort key, id) shown
+        value, last_id = after
+        op = "<" if descending else ">"
+        if order_by == "id":
+            where.append(f"id {op} ?")
+            params.append(last_id)
+        else:
+            where.append(f"({order_by}, id) {op} (?, ?)")
+            params += [value, last_id]
+
+    direction = "DESC" if descending else "ASC"
+    sql = f"SELECT {', '.join(columns)} FROM books"
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    sql += f" ORDER BY {order_by} {direction}, id {direction}"
+    if limit is not None or offset:
+        sql += " LIMIT ?"
+        params.append(limit if limit is not None else -1)
+    if offset:
+        sql += " OFFSET ?"
+        params.append(offset)
+    return sql, params
+
+# Stream matching rows straight from the cursor
+def query_books(**filters):
+    con = sqlite3.connect(DATABASE)
     try:
-        response = requests.get(url)
-        response.raise_for_status()
-    except requests.RequestException as e:
-        logging.error(f"Request error: {e}")
-        return []
-
-    books = []
-    soup = BeautifulSoup(response.text, "html.parser")
-    book_elements = soup.find_all("article", class_="product_pod")
-
-    for book in book_elements:
-        try:
-            title = book.h3.a['title']
-            price_text = book.find("p", class_="price_color").text
-            currency = price_text[0]
-            price = float(price_text[1:])
-
-            books.append({"title": title, "currency": currency, "price": price})
-            insert_book(title, currency, price)
-        except Exception as e:
-            logging.warning(f"Error parsing book: {e}")
+        yield from con.execute(*build_query(**filters))
+    finally:
+        con.close()
 
-    logging.info(f"Scraped {len(books)} books from {url}")
-    return books
-
-# Scrape all pages
-def scrape_all_pages(base_url):
-    page = 1
-    all_books = []
-    while True:
-        page_url = f"{base_url}catalogue/page-{page}.html"
-        books = scrape_books(page_url)
-        if not books:
-            break
-        all_books.extend(books)
-        page += 1
-    logging.info(f"Scraping complete. Total books: {len(all_books)}")
-    return all_books
-
-# Save JSON
-def save_to_json(books, filename=JSON_FILE):
+# Stream book records from the database in fetchmany batches
+def iter_db_books(fields=FIELDS, batch_size=5000, **filters):
+    con = sqlite3.connect(DATABASE)
     try:
-        with open(filename, "w", encoding="utf-8") as f:
-            json.dump(books, f, ensure_ascii=False, indent=4)
-        logging.info(f"Saved to {filename}")
-    except Exception as e:
-        logging.error(f"JSON save error: {e}")
-
-# Save CSV
-def save_to_csv(books, filename=CSV_FILE):
+        cur = con.execute(*build_query(columns=fields, **filters))
+        while True:
+            rows = cur.fetchmany(batch_size)
+            if not rows:
+                break
+            for row in rows:
+                yield dict(zip(fields, row))
+    finally:
+        con.close()
+
+# Export the database (optionally filtered) without crawling
+def export_from_db(formats, json_lines=False, fields=FIELDS, **filters):
     try:
-        with open(filename, "w", newline="", encoding="utf-8") as f:
-            writer = csv.DictWriter(f, fieldnames=["title", "currency", "price"])
-            writer.writeheader()
-            writer.writerows(books)
-        logging.info(f"Saved to {filename}")
+        count = export_stream(iter_db_books(fields, **filters), make_sinks(formats, json_lines, fields))
     except Exception as e:
-        logging.error(f"CSV save error: {e}")
+        logging.error(f"Export error: {e}")
+        return None
+    logging.info(f"Exported {count} books from {DATABASE}")
+    return count
+
+# Parse a keyset cursor "VALUE,ID" printed by a previous query
+def parse_cursor(cursor, order_by):
+    value, last_id = cursor.rsplit(",", 1)
+    if order_by == "price":
+        value = float(value)
+    elif order_by == "id":
+        value = int(value)
+    return value, int(last_id)
+
+# Print rows as they arrive; returns (rows printed, last row)
+def print_rows(rows):
+    count = 0
+    last = None
+    for row in rows:
+        if count == 0:
+            print(f"{'id':>7}  {'price':>9}  title")
+            print(f"{'-' * 7}  {'-' * 9}  {'-' * 40}")
+        book_id, title, currency, price = row
+        print(f"{book_id:>7}  {currency}{price:>8.2f}  {title}")
+        count += 1
+        last = row
+    return count, last
+
+# Run a query from CLI options and print a keyset cursor for the next page
+def run_query(order_by="id", limit=50, **filters):
+    try:
+        count, last = print_rows(query_books(order_by=order_by, limit=limit, **filters))
+    except sqlite3.Error as e:
+        logging.error(f"Query error: {e}")
+        return
+    if count == 0:
+        logging.info("No matching books.")
+    elif limit is not None and count == limit:
+        key = {"id": 0, "title": 1, "price": 3}[order_by]
+        print(f"\nNext page: --after '{last[key]},{last[0]}'")
+
+# Books whose price moved at least `percent` since a date (history rows at or before it give the old price)
+def price_changes(since, percent=0.0, limit=None):
+    sql = """
+        SELECT cur.book_id, cur.title, cur.currency, old.price, cur.price,
+               (cur.price - old.price) * 100.0 / old.price AS change, cur.scraped_at
+        FROM (SELECT DISTINCT book_id FROM price_history WHERE scraped_at > :since) moved
+        JOIN current_price cur ON cur.book_id = moved.book_id
+        JOIN price_history old ON old.id = (
+            SELECT id FROM price_history
+            WHERE book_id = moved.book_id AND scraped_at <= :since
+            ORDER BY scraped_at DESC, id DESC LIMIT 1
+        )
+        WHERE old.price != 0 AND abs(cur.price - old.price) * 100.0 / old.price >= :percent
+        ORDER BY abs(change) DESC
+    """
+    params = {"since": since, "percent": percent}
+    if limit is not None:
+        sql += " LIMIT :limit"
+        params["limit"] = limit
+    con = sqlite3.connect(DATABASE)
+    try:
+        yield from con.execute(sql, params)
+    finally:
+        con.close()
 
-# Import CSV to DB
-def import_csv_to_db(csv_file):
+# Print price movements since a date
+def run_price_changes(since, percent=0.0, limit=50):
     try:
-        with sqlite3.connect(DATABASE) as con, open(csv_file, "r", encoding="utf-8") as f:
-            cur = con.cursor()
-            reader = csv.DictReader(f)
-            for row in reader:
-                cur.execute(
-                    "INSERT INTO books (title, currency, price) VALUES (?, ?, ?)",
-                    (row["title"], row["currency"], float(row["price"]))
-                )
-        logging.info(f"Imported CSV: {csv_file}")
-    except Exception as e:
-        logging.error(f"CSV import error: {e}")
+        count = 0
+        for book_id, title, currency, old, new, change, changed_at in price_changes(since, percent, limit):
+            if count == 0:
+                print(f"{'id':>7}  {'was':>9}  {'now':>9}  {'change':>7}  {'changed at':<19}  title")
+                print(f"{'-' * 7}  {'-' * 9}  {'-' * 9}  {'-' * 7}  {'-' * 19}  {'-' * 40}")
+            print(f"{book_id:>7}  {currency}{old:>8.2f}  {currency}{new:>8.2f}  {change:>+6.1f}%  {changed_at:<19}  {title}")
+            count += 1
+    except sqlite3.Error as e:
+        logging.error(f"Price history error: {e}")
+        return
+    if count == 0:
+        logging.info(f"No prices moved {percent}% or more since {since}.")
+
+# FTS5 query matching every word, the last one as a prefix
+def fts_query(text):
+    terms = ['"' + term.replace('"', '""') + '"' for term in text.split()]
+    if terms:
+        terms[-1] += "*"
+    return " ".join(terms)
+
+# Titles matching a search, best bm25 rank first, with matches highlighted
+def search_books(text, limit=50):
+    start, end = ("\033[1m", "\033[0m") if sys.stdout.isatty() else ("[", "]")
+    con = sqlite3.connect(DATABASE)
+    try:
+        yield from con.execute("""
+            SELECT books.id, highlight(books_fts, 0, ?, ?), books.currency, books.price
+            FROM books_fts JOIN books ON books.id = books_fts.rowid
+            WHERE books_fts MATCH ?
+            ORDER BY bm25(books_fts)
+            LIMIT ?
+        """, (start, end, fts_query(text), limit))
+    finally:
+        con.close()
+
+# Print search results
+def run_search(text, limit=50):
+    if not text.split():
+        logging.info("Nothing to search for.")
+        return
+    try:
+        count, _ = print_rows(search_books(text, limit))
+    except sqlite3.Error as e:
+        logging.error(f"Search error: {e}")
+        return
+    if count == 0:
+        logging.info("No matching books.")
 
 # Display books
 def display_books():
     try:
-        with sqlite3.connect(DATABASE) as con:
-            cur = con.cursor()
-            cur.execute("SELECT * FROM books")
-            rows = cur.fetchall()
-            headers = [description[0] for description in cur.description]
-            if rows:
-                print("\n📚 Books in Database:\n")
-                print(tabulate(rows, headers=headers, tablefmt="fancy_grid"))
-            else:
-                logging.info("Database is empty.")
+        print("\n📚 Books in Database:\n")
+        count, _ = print_rows(query_books())
+        if count == 0:
+            logging.info("Database is empty.")
     except sqlite3.Error as e:
         logging.error(f"Display error: {e}")
 
@@ -671,22 +2659,237 @@ def parse_args():
     parser = argparse.ArgumentParser(description="Books Scraper CLI")
     parser.add_argument("--scrape", action="store_true", help="Scrape all books")
     parser.add_argument("--display", action="store_true", help="Display all books")
-    parser.add_argument("--export", action="store_true", help="Export books to JSON and CSV")
-    return parser.parse_args()
+    parser.add_argument("--search", metavar="TEXT", help="Full-text search over titles")
+    parser.add_argument("--rebuild-search", action="store_true", help="Rebuild the full-text search index")
+    parser.add_argument("--query", action="store_true", help="Query books with filters and pagination")
+    parser.add_argument("--price-changes", metavar="DATE",
+                        help="List books whose price moved since DATE (YYYY-MM-DD[ HH:MM:SS], UTC)")
+    parser.add_argument("--min-change", type=float, default=0.0,
+                        help="With --price-changes: minimum absolute change in percent")
+    parser.add_argument("--min-price", type=float, help="Query: minimum price")
+    parser.add_argument("--max-price", type=float, help="Query: maximum price")
+    parser.add_argument("--title-prefix", help="Query: titles starting with this text")
+    parser.add_argument("--title-contains", help="Query: titles containing this text")
+    parser.add_argument("--currency", help="Query: currency symbol")
+    parser.add_argument("--order-by", choices=ORDER_KEYS, default="id", help="Query: sort key")
+    parser.add_argument("--desc", action="store_true", help="Query: sort descending")
+    parser.add_argument("--limit", type=int, default=50, help="Query: rows per page")
+    parser.add_argument("--offset", type=int, default=0, help="Query: rows to skip")
+    parser.add_argument("--after", help="Query: keyset cursor printed by the previous page")
+    parser.add_argument("--import", dest="import_file", metavar="FILE", help="Bulk import books from CSV, JSON Lines or JSON")
+    parser.add_argument("--reject-file", help="Where to write malformed import rows (default: FILE.rejects.jsonl)")
+    parser.add_argument("--chunk-size", type=int, default=50000, help="Import rows per transaction")
+    parser.add_argument("--export", action="store_true",
+                        help="Export books (the crawl with --scrape, otherwise the database, honouring query filters)")
+    parser.add_argument("--export-format", nargs="+", choices=EXPORT_FORMATS, default=["json", "csv"],
+                        help="Formats written by --export (arrow and parquet need pyarrow)")
+    parser.add_argument("--json-lines", action="store_true", help=f"Export JSON Lines to {JSONL_FILE} instead of a JSON array")
+    parser.add_argument("--url", default=URL, help="Catalogue base URL")
+    parser.add_argument("--profile", nargs="+", metavar="TOML_FILE",
+                        help="Crawl the site profiles in these TOML files concurrently (instead of --url)")
+    parser.add_argument("--source", help="Query/export: only books from this profile ('' for the built-in catalogue)")
+    parser.add_argument("--concurrency", type=int, default=1, help="Pages fetched in parallel")
+    parser.add_argument("--details", action="store_true", help="Also crawl every book's detail page (UPC, stock, category, rating, description)")
+    parser.add_argument("--pipeline", action="store_true", help="Fetch, parse and write in separate stages")
+    parser.add_argument("--fetch-workers", type=int, default=4, help="Fetch threads in pipeline mode")
+    parser.add_argument("--parse-workers", type=int, default=None, help="Parser processes in pipeline mode (default: CPU count)")
+    parser.add_argument("--queue-size", type=int, default=64, help="Raw pages buffered between fetch and parse")
+    parser.add_argument("--cache-dir", help="Directory for the conditional-request page cache")
+    parser.add_argument("--cache-size", type=int, default=64, help="Page cache size limit in MB")
+    parser.add_argument("--resume", action="store_true", help="Continue the last unfinished crawl of --url")
+    parser.add_argument("--full", action="store_true", help="Reprocess pages even if their content is unchanged")
+    parser.add_argument("--pool-size", type=int, default=10, help="HTTP connection pool size")
+    parser.add_argument("--connect-timeout", type=float, default=5.0, help="Connect timeout in seconds")
+    parser.add_argument("--read-timeout", type=float, default=30.0, help="Read timeout in seconds")
+    parser.add_argument("--retries", type=int, default=3, help="Retries on 429/5xx and connection errors")
+    parser.add_argument("--backoff", type=float, default=0.5, help="Base backoff delay in seconds")
+    parser.add_argument("--parser", choices=list(PARSERS), default="html.parser", help="HTML parser backend")
+    parser.add_argument("--benchmark-parsers", nargs="+", metavar="HTML_FILE", help="Benchmark parser backends on saved pages")
+    parser.add_argument("--rounds", type=int, default=20, help="Benchmark rounds per page")
+    parser.add_argument("--max-rps", type=float, default=None, help="Requests per second per host")
+    parser.add_argument("--adaptive", action="store_true", help="Adapt requests in flight per host (AIMD)")
+    parser.add_argument("--max-in-flight", type=int, default=32, help="Upper bound for --adaptive")
+    parser.add_argument("--latency-target", type=float, default=2.0, help="Latency in seconds above which --adaptive backs off")
+    parser.add_argument("--batch-size", type=int, default=500, help="Books per database transaction")
+    parser.add_argument("--coordinate", action="store_true",
+                        help="Queue --url as page-range shards; with --workers, crawl them in worker processes and merge")
+    parser.add_argument("--worker", action="store_true",
+                        help="Lease and crawl shards from the database's work queue until it is drained")
+    parser.add_argument("--merge", action="store_true", help="Merge worker staging tables into books")
+    parser.add_argument("--workers", type=int, default=0, help="Local worker processes started by --coordinate")
+    parser.add_argument("--shard-size", type=int, default=10, help="Pages per work-queue shard")
+    parser.add_argument("--lease-timeout", type=float, default=LEASE_TIMEOUT,
+                        help="Seconds before a silent worker's shard is reclaimed")
+    parser.add_argument("--daemon", action="store_true",
+                        help="Keep running and refresh --url on a schedule, changing pages first")
+    parser.add_argument("--interval", type=float, default=3600.0, help="Daemon: base revisit interval in seconds")
+    parser.add_argument("--max-interval", type=float, default=None,
+                        help="Daemon: longest revisit interval for stable pages (default 16x --interval)")
+    parser.add_argument("--status-port", type=int, default=None,
+                        help="Daemon: serve /status and /metrics on this local port")
+    parser.add_argument("--metrics-file", help="Write run metrics to this file after --scrape")
+    parser.add_argument("--metrics-format", choices=["json", "prometheus"], default="json",
+                        help="Format of --metrics-file (prometheus writes the textfile-collector format)")
+    parser.add_argument("-v", "--verbose", action="store_true", help="Log every page and batch (DEBUG)")
+    args = parser.parse_args()
+    if args.export and not HAVE_PYARROW and {"arrow", "parquet"} & set(args.export_format):
+        parser.error("--export-format arrow and parquet need pyarrow (pip install pyarrow)")
+    return args
+
+# Whether any requested command touches the database
+def needs_database(args):
+    return any([args.scrape, args.daemon, args.coordinate, args.worker, args.merge, args.export, args.display, args.search, args.rebuild_search, args.query,
+                args.price_changes, args.import_file])
 
 # Main execution
 def main():
-    create_table()
+    global skip_unchanged
     args = parse_args()
+    setup_logging(args.verbose)
+
+    if needs_database(args):
+        create_table()
+
+    configure_parser(args.parser)
+
+    if args.import_file:
+        import_file(args.import_file, args.chunk_size, args.reject_file)
+
+    if args.benchmark_parsers:
+        benchmark_parsers(args.benchmark_parsers, args.rounds)
+
+    profiles = []
+    if args.profile:
+        try:
+            profiles = [profile for path in args.profile for profile in load_profiles(path)]
+        except (OSError, ValueError) as e:
+            logging.error(f"Profile error: {e}")
+            return
+    # Exports that mix (or pick) sites say which profile each book came from
+    export_fields = DETAIL_FIELDS if args.details else FIELDS
+    if profiles or args.source is not None:
+        export_fields = export_fields + ["source"]
+
+    fetch_options = {
+        "pool_size": max(args.pool_size, args.concurrency * max(1, len(profiles)), args.fetch_workers),
+        "connect_timeout": args.connect_timeout,
+        "read_timeout": args.read_timeout,
+        "retries": args.retries,
+        "backoff": args.backoff,
+        "max_rps": args.max_rps,
+        "adaptive": args.adaptive,
+        "max_in_flight": args.max_in_flight,
+        "latency_target": args.latency_target,
+    }
+
+    if args.coordinate:
+        configure_fetcher(**fetch_options)
+        coordinate(args.url, args.workers, fetch_options, args.parser, args.concurrency, args.shard_size,
+                   args.lease_timeout, args.verbose)
+
+    if args.worker:
+        configure_fetcher(**fetch_options)
+        run_worker(concurrency=args.concurrency, lease_timeout=args.lease_timeout)
+
+    if args.merge:
+        merge_staging()
+
+    if args.daemon:
+        import signal
+        configure_fetcher(**fetch_options)
+        configure_writer(batch_size=args.batch_size)
+        configure_cache(args.cache_dir, args.cache_size * 1024 * 1024)
+        skip_unchanged = not args.full
+        daemon = Daemon(args.url, args.interval, args.max_interval, args.concurrency)
+        signal.signal(signal.SIGTERM, lambda signum, frame: daemon.stop.set())
+        try:
+            daemon.run(args.status_port)
+        except KeyboardInterrupt:
+            daemon.stop.set()
+        close_writer()
 
     if args.scrape:
-        books = scrape_all_pages(URL)
-        if args.export:
-            save_to_json(books)
-            save_to_csv(books)
+        configure_fetcher(**fetch_options)
+        configure_writer(batch_size=args.batch_size)
+        configure_cache(args.cache_dir, args.cache_size * 1024 * 1024)
+        skip_unchanged = not args.full
+        if profiles:
+            crawl_profiles(profiles, args.concurrency)
+        else:
+            checkpoint = start_run(args.url, args.resume)
+            if args.details:
+                books = crawl_details(args.url, args.concurrency)
+            elif args.pipeline:
+                books = scrape_pipeline(args.url, args.fetch_workers, args.parse_workers, args.queue_size, checkpoint)
+            else:
+                books = scrape_all_pages(args.url, args.concurrency, checkpoint)
+            sinks = []
+            if args.export:
+                if not args.details:
+                    # A resumed run's export also holds the pages committed before the resume
+                    books = itertools.chain(committed_books(checkpoint), books)
+                try:
+                    sinks = make_sinks(args.export_format, args.json_lines, export_fields)
+                except Exception as e:
+                    # The crawl still goes to the database; export it later with --export
+                    logging.error(f"Export error: {e}")
+            try:
+                export_stream(books, sinks)
+                get_writer().finish_run("complete" if not get_fetcher().failed else "incomplete")
+            except Exception as e:
+                logging.error(f"Scrape error: {e}")
+                get_writer().finish_run("incomplete")
+        close_writer()
+        get_fetcher().log_stats()
+        logging.info(
+            f"Pages: {page_stats['processed']} processed, {page_stats['unchanged']} unchanged, "
+            f"{page_stats['not_modified']} not modified, {page_stats['failed']} failed"
+        )
+        if page_stats["failed"]:
+            logging.warning(f"{page_stats['failed']} pages failed and were skipped; run again with --resume to retry them")
+        if cache is not None:
+            logging.info(f"Cache: {cache.hits} pages not modified, {cache.size / 1e6:.1f} MB on disk")
+        metrics.log_summary()
+        if args.metrics_file:
+            metrics.write(args.metrics_file, args.metrics_format)
+
+    filters = {
+        "min_price": args.min_price,
+        "max_price": args.max_price,
+        "title_prefix": args.title_prefix,
+        "title_contains": args.title_contains,
+        "currency": args.currency,
+        "source": args.source,
+    }
+
+    # Profile crawls run side by side, so their export is read back from the database, limited to the crawled profiles
+    if args.export and (not args.scrape or profiles):
+        export_filters = dict(filters)
+        if args.scrape and profiles:
+            export_filters["sources"] = [profile.name for profile in profiles]
+        export_from_db(args.export_format, args.json_lines, export_fields, **export_filters)
 
     if args.display:
         display_books()
 
+    if args.rebuild_search:
+        rebuild_search_index()
+
+    if args.search:
+        run_search(args.search, args.limit)
+
+    if args.price_changes:
+        run_price_changes(args.price_changes, args.min_change, args.limit)
+
+    if args.query:
+        run_query(
+            order_by=args.order_by,
+            descending=args.desc,
+            limit=args.limit,
+            offset=args.offset,
+            after=parse_cursor(args.after, args.order_by) if args.after else None,
+            **filters,
+        )
+
 if __name__ == "__main__":
     main()
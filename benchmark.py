@@ -0,0 +1,300 @@
+import argparse
+import html
+import json
+import logging
+import multiprocessing
+import os
+import random
+import re
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from tabulate import tabulate
+
+import WebScrapper as scraper
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+RESULTS_FILE = "benchmark_results.jsonl"
+PAGE_RE = re.compile(r"^/catalogue/page-(\d+)\.html$")
+RATING_WORDS = ["One", "Two", "Three", "Four", "Five"]
+
+# One book card in the catalogue's product_pod markup
+CARD = """
+            <li class="col-xs-6 col-sm-4 col-md-3 col-lg-3">
+    <article class="product_pod">
+            <div class="image_container">
+                    <a href="{slug}/index.html"><img src="../media/cache/{image}.jpg" alt="{title}" class="thumbnail"></a>
+            </div>
+                <p class="star-rating {rating}">
+                    <i class="icon-star"></i>
+                    <i class="icon-star"></i>
+                    <i class="icon-star"></i>
+                    <i class="icon-star"></i>
+                    <i class="icon-star"></i>
+                </p>
+            <h3><a href="{slug}/index.html" title="{title}">{short_title}</a></h3>
+            <div class="product_price">
+        <p class="price_color">£{price:.2f}</p>
+<p class="instock availability">
+    <i class="icon-ok"></i>
+        In stock
+</p>
+    <form>
+        <button type="submit" class="btn btn-primary btn-block" data-loading-text="Adding...">Add to basket</button>
+    </form>
+            </div>
+    </article>
+</li>
+"""
+
+# Catalogue page around the cards, with the pager the scraper reads
+PAGE = """<!DOCTYPE html>
+<html lang="en-us" class="no-js">
+<head>
+    <title>All products | Books to Scrape - Sandbox</title>
+    <meta http-equiv="content-type" content="text/html; charset=UTF-8" />
+</head>
+<body id="default" class="default">
+<div class="container-fluid page">
+    <div class="page_inner">
+        <div class="page-header action"><h1>All products</h1></div>
+        <section>
+            <div>
+                <ol class="row">
+{cards}
+                </ol>
+                <div>
+                    <ul class="pager">
+                        <li class="current">
+                            Page {page} of {pages}
+                        </li>
+{next_link}
+                    </ul>
+                </div>
+            </div>
+        </section>
+    </div>
+</div>
+</body>
+</html>
+"""
+
+# Render a deterministic catalogue page
+def render_page(page, pages, books_per_page=20):
+    rng = random.Random(page)
+    cards = []
+    for i in range(books_per_page):
+        number = (page - 1) * books_per_page + i
+        title = f"Synthetic Book {number}: Tales & Notes, Vol. {rng.randint(1, 9)}"
+        cards.append(CARD.format(
+            slug=f"synthetic-book-{number}_{number}",
+            image=f"{number:032x}",
+            title=html.escape(title),
+            short_title=html.escape(title[:25] + "..."),
+            rating=rng.choice(RATING_WORDS),
+            price=rng.uniform(10, 60),
+        ))
+    next_link = f'<li class="next"><a href="page-{page + 1}.html">next</a></li>' if page < pages else ""
+    return PAGE.format(cards="".join(cards), page=page, pages=pages, next_link=next_link)
+
+# Local catalogue server with injectable latency and error rate
+class CatalogueHandler(BaseHTTPRequestHandler):
+    # Keep-alive, like the real site, so the scraper's connection pool is exercised
+    protocol_version = "HTTP/1.1"
+    # Headers and body go out as separate writes; without TCP_NODELAY keep-alive requests stall on delayed ACKs
+    disable_nagle_algorithm = True
+    pages = 10
+    books_per_page = 20
+    latency = 0.0
+    jitter = 0.0
+    error_rate = 0.0
+    rng = random.Random(0)
+
+    def do_GET(self):
+        delay = self.latency + self.rng.uniform(0, self.jitter) if self.jitter else self.latency
+        if delay:
+            time.sleep(delay)
+        if self.error_rate and self.rng.random() < self.error_rate:
+            self.send_error_response(503)
+            return
+        match = PAGE_RE.match(self.path)
+        if match is None or not 1 <= int(match.group(1)) <= self.pages:
+            self.send_error_response(404)
+            return
+        body = render_page(int(match.group(1)), self.pages, self.books_per_page).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_error_response(self, status):
+        self.send_response(status)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+# Threaded server with a listen backlog deep enough for the crawl's concurrency
+class CatalogueServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024
+
+# Start the catalogue server on a free local port (handler: a CatalogueHandler subclass)
+def start_server(pages, books_per_page=20, latency=0.0, jitter=0.0, error_rate=0.0, seed=0, handler=CatalogueHandler):
+    handler = type("Handler", (handler,), {
+        "pages": pages,
+        "books_per_page": books_per_page,
+        "latency": latency,
+        "jitter": jitter,
+        "error_rate": error_rate,
+        "rng": random.Random(seed),
+    })
+    server = CatalogueServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/"
+
+# Peak resident set size of this process in MB (None where unavailable); each backend runs in its own process
+def peak_rss_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS, kilobytes elsewhere
+    return peak / 1e6 if sys.platform == "darwin" else peak / 1e3
+
+# Short commit hash of the checkout, so results can be compared across commits
+def current_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+# Crawl the synthetic catalogue end to end into a fresh database
+def run_benchmark(base_url, parser, args):
+    with tempfile.TemporaryDirectory() as directory:
+        scraper.DATABASE = os.path.join(directory, "books.sqlite3")
+        scraper.create_table()
+        scraper.configure_parser(parser)
+        scraper.configure_fetcher(
+            pool_size=max(10, args.concurrency),
+            retries=args.retries,
+            backoff=args.backoff,
+        )
+        scraper.configure_writer(database=scraper.DATABASE, batch_size=args.batch_size)
+        scraper.page_stats.clear()
+        metrics = scraper.reset_metrics()
+
+        started = time.perf_counter()
+        if args.pipeline:
+            books = scraper.scrape_pipeline(base_url, args.concurrency, args.parse_workers)
+        else:
+            books = scraper.scrape_all_pages(base_url, args.concurrency)
+        rows = sum(1 for _ in books)
+        scraper.close_writer()
+        elapsed = time.perf_counter() - started
+
+    summary = metrics.summary()
+    fetch_stats = scraper.fetcher.stats()
+    pages = scraper.page_stats["processed"]
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "commit": current_commit(),
+        "label": args.label,
+        "parser": parser,
+        "mode": "pipeline" if args.pipeline else ("concurrent" if args.concurrency > 1 else "sequential"),
+        "config": {
+            "pages": args.pages,
+            "books_per_page": args.books_per_page,
+            "concurrency": args.concurrency,
+            "batch_size": args.batch_size,
+            "latency": args.latency,
+            "jitter": args.jitter,
+            "error_rate": args.error_rate,
+        },
+        "pages": pages,
+        "rows": rows,
+        "seconds": elapsed,
+        "pages_per_sec": pages / elapsed if elapsed else 0.0,
+        "rows_per_sec": rows / elapsed if elapsed else 0.0,
+        "peak_rss_mb": peak_rss_mb(),
+        "latency_p50": summary.get("fetch_seconds", {}).get("p50"),
+        "latency_p99": summary.get("fetch_seconds", {}).get("p99"),
+        "parse_p50": summary.get("parse_seconds", {}).get("p50"),
+        "write_p99": summary.get("write_seconds", {}).get("p99"),
+        "retried": fetch_stats["retried"],
+        "failed": fetch_stats["failed"],
+    }
+
+# Run one backend in a fresh process, so its peak RSS is not carried over from the previous backend
+def run_isolated(base_url, parser, args):
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=1, mp_context=context, initializer=scraper.setup_logging) as pool:
+        return pool.submit(run_benchmark, base_url, parser, args).result()
+
+# Append results as JSON Lines
+def save_results(results, filename=RESULTS_FILE):
+    with open(filename, "a", encoding="utf-8") as f:
+        for result in results:
+            f.write(json.dumps(result) + "\n")
+    logging.info(f"Results appended to {filename}")
+
+# Print one row per run
+def print_results(results):
+    columns = ["parser", "mode", "pages", "rows", "seconds", "pages_per_sec", "rows_per_sec",
+               "peak_rss_mb", "latency_p50", "latency_p99", "failed"]
+    print(tabulate([[result[column] for column in columns] for result in results], headers=columns, floatfmt=".4g"))
+
+# CLI Arguments
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark the scraper against a synthetic local catalogue")
+    parser.add_argument("--pages", type=int, default=100, help="Catalogue pages to generate (10 to 100000)")
+    parser.add_argument("--books-per-page", type=int, default=20, help="Book cards per page")
+    parser.add_argument("--latency", type=float, default=0.0, help="Server latency per request in seconds")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Extra random latency up to this many seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with 503")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for latency jitter and injected errors")
+    parser.add_argument("--parsers", nargs="+", choices=list(scraper.PARSERS), default=["html.parser"],
+                        help="Parser backends to benchmark, one run each")
+    parser.add_argument("--concurrency", type=int, default=8, help="Pages fetched in parallel (fetch threads with --pipeline)")
+    parser.add_argument("--pipeline", action="store_true", help="Benchmark the fetch/parse/write pipeline")
+    parser.add_argument("--parse-workers", type=int, default=None, help="Parser processes with --pipeline")
+    parser.add_argument("--batch-size", type=int, default=500, help="Books per database transaction")
+    parser.add_argument("--retries", type=int, default=3, help="Retries on injected errors")
+    parser.add_argument("--backoff", type=float, default=0.05, help="Base backoff delay in seconds")
+    parser.add_argument("--label", help="Free-form label stored with the results")
+    parser.add_argument("--results", default=RESULTS_FILE, help="JSON Lines file the results are appended to")
+    return parser.parse_args()
+
+# Main execution
+def main():
+    args = parse_args()
+    scraper.setup_logging()
+    server, base_url = start_server(args.pages, args.books_per_page, args.latency, args.jitter,
+                                    args.error_rate, args.seed)
+    logging.info(f"Serving {args.pages} synthetic pages at {base_url}")
+    results = []
+    try:
+        for parser in args.parsers:
+            logging.info(f"Benchmarking {parser}")
+            results.append(run_isolated(base_url, parser, args))
+    finally:
+        server.shutdown()
+    print_results(results)
+    save_results(results, args.results)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,39 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import WebScrapper as scraper
+import benchmark
+
+# Fresh database and writer for each test
+@pytest.fixture
+def database(tmp_path, monkeypatch):
+    path = str(tmp_path / "books.sqlite3")
+    monkeypatch.setattr(scraper, "DATABASE", path)
+    scraper.create_table()
+    scraper.configure_writer(database=path)
+    scraper.page_stats.clear()
+    yield path
+    scraper.close_writer()
+
+# Start synthetic catalogues (benchmark.start_server options) and shut them down after the test
+@pytest.fixture
+def serve():
+    servers = []
+
+    def start(pages=5, **options):
+        server, base_url = benchmark.start_server(pages, **options)
+        servers.append(server)
+        return base_url
+
+    yield start
+    for server in servers:
+        server.shutdown()
+
+# Synthetic catalogue served locally: 5 pages of 20 books
+@pytest.fixture
+def catalogue(serve):
+    return serve()
@@ -0,0 +1,62 @@
+import sqlite3
+
+import pytest
+
+import WebScrapper as scraper
+import benchmark
+
+# Catalogue with ETags, answering 304 to a matching If-None-Match
+class RevalidatingHandler(benchmark.CatalogueHandler):
+    def do_GET(self):
+        etag = f'"{self.path}"'
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        super().do_GET()
+
+    def send_header(self, keyword, value):
+        super().send_header(keyword, value)
+        if keyword == "Content-Type":
+            super().send_header("ETag", f'"{self.path}"')
+
+@pytest.fixture
+def revalidating_catalogue(serve):
+    return serve(handler=RevalidatingHandler)
+
+@pytest.fixture
+def page_cache(tmp_path):
+    yield scraper.configure_cache(str(tmp_path / "cache"), 64 * 1024 * 1024)
+    scraper.configure_cache(None, 0)
+
+# Stored row counts
+def stored_books(database):
+    scraper.get_writer().flush()
+    with sqlite3.connect(database) as con:
+        return con.execute("SELECT COUNT(*) FROM books").fetchone()[0]
+
+# A cache directory reused with a fresh database must not turn every page into a 304 with nothing written
+def test_cache_reused_with_new_database(database, revalidating_catalogue, page_cache, tmp_path, monkeypatch):
+    assert len(list(scraper.scrape_all_pages(revalidating_catalogue))) == 100
+    assert len(list(scraper.scrape_all_pages(revalidating_catalogue))) == 100
+    assert scraper.page_stats["not_modified"] == 5
+
+    other = str(tmp_path / "other.sqlite3")
+    monkeypatch.setattr(scraper, "DATABASE", other)
+    scraper.create_table()
+    scraper.configure_writer(database=other)
+    scraper.page_stats.clear()
+    assert len(list(scraper.scrape_all_pages(revalidating_catalogue))) == 100
+    assert scraper.page_stats["processed"] == 5
+    assert stored_books(other) == 100
+
+# --full downloads and parses every page even when the cache could revalidate it
+def test_full_crawl_skips_revalidation(database, revalidating_catalogue, page_cache, monkeypatch):
+    assert len(list(scraper.scrape_all_pages(revalidating_catalogue))) == 100
+    monkeypatch.setattr(scraper, "skip_unchanged", False)
+    scraper.page_stats.clear()
+    assert len(list(scraper.scrape_all_pages(revalidating_catalogue))) == 100
+    assert scraper.page_stats["processed"] == 5
+    assert scraper.page_stats["not_modified"] == 0
@@ -0,0 +1,18 @@
+import pytest
+
+import WebScrapper as scraper
+
+# A sink that cannot be opened closes the ones opened before it, leaving valid files behind
+def test_make_sinks_closes_opened_sinks_on_failure(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(scraper, "load_pyarrow", lambda: None)
+    with pytest.raises(RuntimeError):
+        scraper.make_sinks(["json", "csv", "parquet"])
+    assert (tmp_path / scraper.JSON_FILE).read_text(encoding="utf-8") == "[]\n"
+    assert (tmp_path / scraper.CSV_FILE).read_text(encoding="utf-8") == "title,currency,price\n"
+
+# Profile exports are limited to the crawled profiles' sources
+def test_build_query_sources():
+    sql, params = scraper.build_query(sources=["a", "b"], min_price=1.0)
+    assert "source IN (?, ?)" in sql
+    assert params == [1.0, "a", "b"]
@@ -0,0 +1,34 @@
+import pytest
+
+import WebScrapper as scraper
+import benchmark
+
+# Catalogue where page 2 always answers 503
+class FailingPageHandler(benchmark.CatalogueHandler):
+    def do_GET(self):
+        if self.path == "/catalogue/page-2.html":
+            self.send_error_response(503)
+            return
+        super().do_GET()
+
+@pytest.fixture
+def failing_catalogue(serve):
+    scraper.configure_fetcher(retries=1, backoff=0.0)
+    yield serve(handler=FailingPageHandler)
+    scraper.configure_fetcher()
+
+# A page that keeps failing is skipped and left for --resume; the crawl still reaches the last page
+@pytest.mark.parametrize("crawl", [
+    lambda url, checkpoint: scraper.scrape_all_pages(url, 1, checkpoint),
+    lambda url, checkpoint: scraper.scrape_all_pages(url, 4, checkpoint),
+    lambda url, checkpoint: scraper.scrape_pipeline(url, 2, 2, checkpoint=checkpoint),
+], ids=["sequential", "concurrent", "pipeline"])
+def test_failed_page_is_skipped(database, failing_catalogue, crawl):
+    checkpoint = scraper.start_run(failing_catalogue)
+    books = list(crawl(failing_catalogue, checkpoint))
+    assert len(books) == 80
+    assert scraper.page_stats["failed"] == 1
+    scraper.get_writer().finish_run("incomplete")
+    resumed = scraper.get_writer().load_checkpoint(failing_catalogue)
+    assert resumed.last_page == 1
+    assert resumed.needed(2) and not resumed.needed(3)
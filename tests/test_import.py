@@ -0,0 +1,29 @@
+import io
+import json
+
+import WebScrapper as scraper
+
+# Elements decode the same whatever the read size, including values cut across reads
+def test_iter_json_array_matches_json_load():
+    records = [{"title": f"Book {i}, \"vol\" ]", "currency": "£", "price": i + 0.25} for i in range(30)] + [12.5e-3, None]
+    text = json.dumps(records, indent=1)
+    for read_size in (1, 7, 64 * 1024):
+        assert list(scraper.iter_json_array(io.StringIO(text), read_size)) == records
+
+# A malformed element in a JSON array is quarantined; the rows around it are still imported
+def test_import_json_quarantines_malformed_element(database, tmp_path):
+    path = tmp_path / "books.json"
+    path.write_text(
+        '[{"title": "A", "currency": "£", "price": 1.5},\n'
+        ' {"title": "B", "currency": "£", "price": oops},\n'
+        ' {"title": "C", "currency": "£", "price": 3}]\n',
+        encoding="utf-8",
+    )
+    result = scraper.import_file(str(path))
+    assert result["rows"] == 3
+    assert result["written"] == 2
+    assert result["rejected"] == 1
+    with open(f"{path}.rejects.jsonl", encoding="utf-8") as f:
+        reject = json.loads(f.readline())
+    assert reject["line"] == 2
+    assert "oops" in reject["record"]
@@ -0,0 +1,26 @@
+import glob
+import os
+
+import pytest
+
+import WebScrapper as scraper
+
+FIXTURES = sorted(glob.glob(os.path.join(os.path.dirname(__file__), "fixtures", "catalogue-*.html")))
+
+def read_fixture(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return f.read()
+
+# Every available backend must return exactly what the BeautifulSoup reference parser returns
+@pytest.mark.parametrize("parser", list(scraper.PARSERS))
+@pytest.mark.parametrize("path", FIXTURES, ids=os.path.basename)
+def test_parser_matches_bs4(parser, path):
+    html = read_fixture(path)
+    expected = scraper.parse_books_bs4(html)
+    assert len(expected) == 20
+    assert [book.to_dict() for book in scraper.PARSERS[parser](html)] == [book.to_dict() for book in expected]
+
+# The pager is read the same way from both fixtures
+@pytest.mark.parametrize("path", FIXTURES, ids=os.path.basename)
+def test_page_count(path):
+    assert scraper.parse_page_count(read_fixture(path)) == 50
@@ -0,0 +1,16 @@
+import WebScrapper as scraper
+
+# Run one pipeline crawl to completion and return its books
+def crawl(base_url):
+    checkpoint = scraper.start_run(base_url)
+    books = list(scraper.scrape_pipeline(base_url, fetch_workers=2, parse_workers=2, checkpoint=checkpoint))
+    scraper.get_writer().finish_run()
+    return books
+
+# Unchanged pages must keep their stored books across repeated pipeline runs
+def test_pipeline_repeated_runs_keep_stored_books(database, catalogue):
+    first = crawl(catalogue)
+    assert len(first) == 100
+    for _ in range(2):
+        assert crawl(catalogue) == first
+    assert list(scraper.scrape_all_pages(catalogue)) == first
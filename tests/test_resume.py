@@ -0,0 +1,30 @@
+import itertools
+
+import WebScrapper as scraper
+
+# A resumed run replays the books of the pages committed before the resume, then crawls the rest
+def test_resumed_run_replays_committed_pages(database, catalogue):
+    full = list(scraper.scrape_all_pages(catalogue))
+    scraper.get_writer().flush()
+
+    checkpoint = scraper.start_run(catalogue)
+    assert len(list(itertools.islice(scraper.scrape_all_pages(catalogue, 1, checkpoint), 40))) == 40
+    scraper.get_writer().finish_run("incomplete")
+
+    checkpoint = scraper.start_run(catalogue, resume=True)
+    assert checkpoint.resumed_page == 2
+    books = itertools.chain(scraper.committed_books(checkpoint), scraper.scrape_all_pages(catalogue, 1, checkpoint))
+    assert list(books) == full
+
+# --resume after a completed run starts afresh instead of reviving an older unfinished one
+def test_resume_ignores_runs_older_than_a_completed_one(database, catalogue):
+    checkpoint = scraper.start_run(catalogue)
+    assert len(list(itertools.islice(scraper.scrape_all_pages(catalogue, 1, checkpoint), 40))) == 40
+    scraper.get_writer().finish_run("incomplete")
+
+    checkpoint = scraper.start_run(catalogue)
+    assert len(list(scraper.scrape_all_pages(catalogue, 1, checkpoint))) == 100
+    scraper.get_writer().finish_run()
+
+    assert scraper.get_writer().load_checkpoint(catalogue) is None
+    assert scraper.start_run(catalogue, resume=True).resumed_page == 0
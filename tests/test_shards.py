@@ -0,0 +1,48 @@
+import sqlite3
+import threading
+import time
+
+import WebScrapper as scraper
+import benchmark
+
+# Catalogue whose first page takes longer than the test's lease timeout
+class SlowFirstPageHandler(benchmark.CatalogueHandler):
+    def do_GET(self):
+        if self.path == "/catalogue/page-1.html":
+            time.sleep(1.5)
+        super().do_GET()
+
+def shard_states(database):
+    with sqlite3.connect(database) as con:
+        return con.execute("SELECT first_page, status, attempts FROM work_queue ORDER BY id").fetchall()
+
+def stored_books(database):
+    with sqlite3.connect(database) as con:
+        return con.execute("SELECT COUNT(*) FROM books").fetchone()[0]
+
+# A shard whose worker went silent is reclaimed once its lease expires, and the merge completes
+def test_expired_lease_is_reclaimed(database, catalogue):
+    scraper.plan_shards(catalogue, shard_size=2)
+    con = scraper.queue_connection()
+    try:
+        assert scraper.lease_shard(con, "silent", lease_timeout=0.05) is not None
+    finally:
+        con.close()
+    time.sleep(0.1)
+
+    assert scraper.run_worker("live", lease_timeout=5.0) == 3
+    assert shard_states(database) == [(1, "done", 2), (3, "done", 1), (5, "done", 1)]
+    assert scraper.merge_staging() == 100
+    assert stored_books(database) == 100
+
+# A live worker keeps its lease across a page slower than the lease timeout
+def test_slow_page_keeps_its_lease(database, serve):
+    base_url = serve(pages=3, handler=SlowFirstPageHandler)
+    scraper.plan_shards(base_url, shard_size=1)
+    workers = [threading.Thread(target=scraper.run_worker, args=(name, 1, 0.3)) for name in ("a", "b")]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    assert shard_states(database) == [(1, "done", 1), (2, "done", 1), (3, "done", 1)]
+    assert scraper.merge_staging() == 60